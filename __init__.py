@@ -1,6 +1,49 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+"""Tkit -- GUI (tkit) and console message (consolemsgs) tools.
+
+The console tools are imported with the package; the Tk-based GUI module is
+only imported when one of its names is first accessed, so console-only
+scripts never pay for loading Tk.
+"""
+
+import importlib
+import sys
+import types
 
-from tkit import *
 from consolemsgs import *
 #import consolemsgs as console
+
+
+class _LazyPackage(types.ModuleType):
+    """Package module that imports the GUI module on first use."""
+    def _gui(self):
+        gui = importlib.import_module(".tkit", self.__name__)
+        for name, value in vars(gui).items():
+            if not name.startswith("_"):
+                self.__dict__.setdefault(name, value)
+        return gui
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        try:
+            return getattr(self._gui(), name)
+        except AttributeError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(
+                self.__name__, name))
+
+    @property
+    def __all__(self):
+        """Names exported by `from <package> import *`."""
+        self._gui()
+        return [name for name in self.__dict__ if not name.startswith("_")]
+
+
+_package = _LazyPackage(__name__, __doc__)
+_package.__dict__.update(
+    (k, v) for k, v in globals().items() if k != "_package")
+# Keep the original module alive; Python 2 clears a module's globals when it
+# is garbage collected
+_package._module = sys.modules[__name__]
+sys.modules[__name__] = _package
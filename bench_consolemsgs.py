@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+bench_consolemsgs.py
+
+Measures the per-item overhead of the consolemsgs progress meter and the
+throughput of status messages, and fails if an overhead exceeds its budget.
+Console output is sent to os.devnull while measuring.
+License: MIT
+
+Usage:
+    python bench_consolemsgs.py [items]
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+import consolemsgs
+from consolemsgs import Progress, nix, progress, status
+
+
+_clock = getattr(time, "perf_counter", time.time)
+
+# Maximum overhead per item in nanoseconds
+BUDGETS = {"progress()": 150, "Progress.tick()": 300}
+
+
+def best_of(func, repeat=5):
+    """Returns the shortest of several timings of func()."""
+    times = []
+    for _ in range(repeat):
+        start = _clock()
+        func()
+        times.append(_clock() - start)
+    return min(times)
+
+
+def main(items=1000000):
+    items = int(items)
+    data = range(items)
+
+    def plain():
+        for _ in data:
+            pass
+
+    def wrapped():
+        for _ in progress(data, "Benchmark"):
+            pass
+
+    def ticked():
+        with Progress("Benchmark", items) as meter:
+            tick = meter.tick
+            for _ in data:
+                tick()
+
+    def messages():
+        for i in range(items // 100):
+            nix.write("Step")
+            nix.ok()
+            status.write("Step")
+            status.success()
+
+    stdout = sys.stdout
+    results = []
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            base = best_of(plain)
+            results.append(("progress()", best_of(wrapped) - base))
+            results.append(("Progress.tick()", best_of(ticked) - base))
+            elapsed = best_of(messages, 3)
+            consolemsgs.writer.flush()
+        finally:
+            sys.stdout = stdout
+
+    failed = False
+    print("{:<20} {:>12} {:>10}".format("case", "ns/item", "budget"))
+    for name, overhead in results:
+        per_item = overhead / items * 1e9
+        ok = per_item <= BUDGETS[name]
+        failed = failed or not ok
+        print("{:<20} {:>12.1f} {:>10} {}".format(
+            name, per_item, BUDGETS[name], "OK" if ok else "FAIL"))
+    print("{:<20} {:>12,.0f} messages/s".format(
+        "nix + status", 4 * (items // 100) / elapsed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*sys.argv[1:2]))
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+bench_import.py
+
+Measures the cold-start import time of tkit's modules in fresh interpreters
+and fails if a median exceeds its budget, or if a console-only import loads
+Tk or colorama.
+License: MIT
+
+Usage:
+    python bench_import.py [runs]
+"""
+
+from __future__ import print_function
+
+import os
+import subprocess
+import sys
+
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE = os.path.basename(_DIR)
+
+# (import statement, median budget in seconds, modules that must not load)
+BUDGETS = [
+    ("import consolemsgs", 0.030, ["Tkinter", "tkinter", "colorama"]),
+    ("import {}".format(PACKAGE), 0.030, ["Tkinter", "tkinter", "colorama"]),
+    ("from {} import status".format(PACKAGE), 0.030,
+     ["Tkinter", "tkinter", "colorama"]),
+    ("import tkit", 0.060, ["tkFileDialog", "tkinter.filedialog",
+                            "multiprocessing", "asyncio"]),
+]
+
+_SCRIPT = """
+import sys, time
+start = time.time()
+{statement}
+elapsed = time.time() - start
+print(elapsed)
+print(",".join(m for m in {forbidden!r} if m in sys.modules))
+"""
+
+
+def measure(statement, forbidden, runs):
+    """Returns the sorted import times and the forbidden modules loaded."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [_DIR, os.path.dirname(_DIR), env.get("PYTHONPATH", "")])
+    script = _SCRIPT.format(statement=statement, forbidden=forbidden)
+    times = []
+    loaded = set()
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", script],
+                                      env=env, cwd=_DIR)
+        lines = out.decode().splitlines() + [""]
+        times.append(float(lines[0]))
+        loaded.update(m for m in lines[1].split(",") if m)
+    return sorted(times), sorted(loaded)
+
+
+def main(runs=15):
+    failed = False
+    print("{:<32} {:>9} {:>9} {:>9}".format(
+        "import", "median ms", "max ms", "budget"))
+    for statement, budget, forbidden in BUDGETS:
+        times, loaded = measure(statement, forbidden, runs)
+        median = times[len(times) // 2]
+        ok = median <= budget and not loaded
+        failed = failed or not ok
+        print("{:<32} {:>9.1f} {:>9.1f} {:>9.1f} {}".format(
+            statement, median * 1000, times[-1] * 1000, budget * 1000,
+            "OK" if ok else "FAIL"))
+        if loaded:
+            print("    loaded: {}".format(", ".join(loaded)))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:2]]))
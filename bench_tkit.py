@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+bench_tkit.py
+
+Benchmarks widget construction and the hot paths of tkit, and saves the
+results as a JSON baseline that later runs are compared against. All values
+are "lower is better" (seconds or CPU percent). On Linux without a DISPLAY
+the suite re-runs itself under xvfb-run (a virtual X server).
+License: MIT
+
+Usage:
+    python bench_tkit.py [--quick] [--save FILE] [--compare FILE]
+                         [--tolerance 0.25] [--only CASE ...]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_clock = getattr(time, "perf_counter", time.time)
+
+# Set on the re-run under xvfb-run so it is only tried once
+_XVFB_FLAG = "TKIT_BENCH_XVFB"
+
+
+def _which(name):
+    """Returns the path of an executable on PATH or None."""
+    for folder in os.environ.get("PATH", "").split(os.pathsep):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def ensure_display():
+    """Re-runs the script under xvfb-run if there is no X display."""
+    if (os.name == "nt" or sys.platform == "darwin" or
+            os.environ.get("DISPLAY")):
+        return
+    xvfb_run = _which("xvfb-run")
+    if xvfb_run is None or os.environ.get(_XVFB_FLAG):
+        sys.exit("No DISPLAY and xvfb-run was not found; install Xvfb "
+                 "(e.g. apt-get install xvfb) or set DISPLAY.")
+    env = dict(os.environ)
+    env[_XVFB_FLAG] = "1"
+    command = [xvfb_run, "-a", "-s", "-screen 0 1280x1024x24",
+               sys.executable, os.path.abspath(__file__)] + sys.argv[1:]
+    sys.exit(subprocess.call(command, env=env))
+
+
+def _cpu_time():
+    """Returns the user + system CPU seconds of this process."""
+    times = os.times()
+    return times[0] + times[1]
+
+
+def best_of(func, repeat=3):
+    """Returns the shortest of several timings of func()."""
+    times = []
+    for _ in range(repeat):
+        start = _clock()
+        func()
+        times.append(_clock() - start)
+    return min(times)
+
+
+def run_loop(app, seconds):
+    """Runs app.mainloop() for a number of seconds."""
+    app.after(int(seconds * 1000), app.quit)
+    app.mainloop()
+    return
+
+
+# =============================================================================
+# CASES
+# Each case yields (name, value) pairs.
+
+def bench_app(tkit, sizes):
+    """App construction with N buttons and N text inputs."""
+    for n in sizes:
+        def build():
+            app = tkit.App("Benchmark")
+            for i in range(n):
+                app.add_button("Button {}".format(i), None)
+                app.add_text_input("Input {}".format(i))
+            app.update_idletasks()
+            app.close()
+        yield "app.build[{}]".format(n), best_of(build)
+
+
+def bench_filetree(tkit, sizes, virtual_sizes):
+    """FileTree insertion and removal, in normal and virtual mode.
+    Virtual mode is meant for very large trees, so it runs larger sizes."""
+    app = tkit.App("Benchmark")
+    runs = [(n, False) for n in sizes] + [(n, True) for n in virtual_sizes]
+    for n, virtual in runs:
+        paths = [os.path.join("C:\\" if os.name == "nt" else "/",
+                              "folder{}".format(i // 100),
+                              "file{}.txt".format(i)) for i in range(n)]
+        mode = "virtual" if virtual else "normal"
+        tree = tkit.FileTree(app, virtual=virtual)
+        start = _clock()
+        tree.add_paths(paths)
+        app.update_idletasks()
+        yield "filetree.{}.add[{}]".format(mode, n), _clock() - start
+
+        start = _clock()
+        for path in paths:
+            # Remove through the same path as the Remove button
+            if virtual:
+                tree.tree.focus(tree._rows[0])
+            else:
+                tree.tree.focus(path)
+            tree.rm_file()
+        app.update_idletasks()
+        yield "filetree.{}.remove[{}]".format(mode, n), _clock() - start
+        # FileTree is not a widget itself; its frame holds the widgets
+        tree.container.destroy()
+    app.close()
+
+
+def bench_popup(tkit, count):
+    """Popup creation and display, dismissed as soon as it is shown."""
+    app = tkit.App("Benchmark")
+    if app.tk.call("tk", "windowingsystem") != "x11":
+        # Native message boxes cannot be dismissed from Tcl
+        app.close()
+        return
+
+    def dismiss():
+        # Ends the vwait of the Tk message box once it has been created
+        if app.tk.call("winfo", "exists", ".__tk__messagebox"):
+            app.tk.call("set", "::tk::Priv(button)", "ok")
+        else:
+            app.after(1, dismiss)
+
+    def show():
+        for _ in range(count):
+            app.after(1, dismiss)
+            tkit.Popup("Benchmark", "Message", parent=app).show_info()
+    yield "popup.show_info", best_of(show) / count
+    app.close()
+
+
+def bench_spinner(tkit, seconds):
+    """CPU used by the main loop while idle and while a spinner runs."""
+    app = tkit.App("Benchmark")
+    spinner = tkit.Spinner(app)
+    start = _cpu_time()
+    run_loop(app, seconds)
+    yield "spinner.idle_cpu_percent", (_cpu_time() - start) / seconds * 100
+    spinner.run()
+    start = _cpu_time()
+    run_loop(app, seconds)
+    yield "spinner.running_cpu_percent", ((_cpu_time() - start) /
+                                          seconds * 100)
+    spinner.stop()
+    app.close()
+
+
+def bench_collect(tkit, sizes):
+    """cmd_collect_values with all, one and no inputs changed."""
+    for n in sizes:
+        app = tkit.App("Benchmark")
+        for i in range(n):
+            app.add_text_input("Input {}".format(i))
+        boxes = [app.widgets["input_{}_textbox".format(i)] for i in range(n)]
+        for box in boxes:
+            box.insert(0, "value")
+        start = _clock()
+        app.cmd_collect_values()
+        yield "collect.all_changed[{}]".format(n), _clock() - start
+
+        def one():
+            boxes[0].insert(0, "x")
+            app.cmd_collect_values()
+        yield "collect.one_changed[{}]".format(n), best_of(one)
+        yield "collect.unchanged[{}]".format(n), best_of(
+            app.cmd_collect_values)
+        app.close()
+
+
+def bench_console(tkit, count):
+    """consolemsgs nix/status messages; seconds per message."""
+    import consolemsgs
+    from consolemsgs import nix, status
+
+    def messages():
+        for _ in range(count):
+            nix.write("Step")
+            nix.ok()
+            status.write("Step")
+            status.success()
+        consolemsgs.writer.flush()
+
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            elapsed = best_of(messages)
+        finally:
+            sys.stdout = stdout
+    yield "console.message", elapsed / (4 * count)
+
+
+def cases(quick=False):
+    """Returns the benchmark cases as (name, function, args)."""
+    scale = 1 if quick else 10
+    return [
+        ("app", bench_app, ([10 * scale, 50 * scale],)),
+        # Only virtual mode is meant for 100k paths; normal mode is too slow
+        ("filetree", bench_filetree,
+         ([1000], [1000, 10000]) if quick else
+         ([1000, 10000], [1000, 10000, 100000])),
+        ("popup", bench_popup, (5 * scale,)),
+        ("spinner", bench_spinner, (1 if quick else 3,)),
+        ("collect", bench_collect, ([50 * scale, 200 * scale],)),
+        ("console", bench_console, (2000 * scale,)),
+    ]
+
+
+# =============================================================================
+# BASELINES
+
+def environment():
+    """Describes where the benchmark ran."""
+    import tkit
+    return {"python": platform.python_version(),
+            "platform": platform.platform(),
+            "tk": str(tkit.tk.TkVersion),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, baseline, tolerance):
+    """Prints each result against the baseline.
+    Returns the names of the results more than tolerance (a fraction)
+    slower than the baseline."""
+    regressions = []
+    print("{:<36} {:>12} {:>12} {:>8}".format(
+        "case", "baseline", "current", "change"))
+    for name, value in results.items():
+        old = baseline.get(name)
+        if not old:
+            print("{:<36} {:>12} {:>12.6g}".format(name, "-", value))
+            continue
+        change = value / old - 1
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print("{:<36} {:>12.6g} {:>12.6g} {:>+7.0%} {}".format(
+            name, old, value, change, "SLOWER" if regressed else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--quick", action="store_true",
+                        help="smaller sizes, for a quick check")
+    parser.add_argument("--save", help="write the results to a JSON file")
+    parser.add_argument("--compare", help="JSON baseline to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument("--only", nargs="*", help="case names to run")
+    args = parser.parse_args(argv)
+
+    ensure_display()
+    sys.path.insert(0, _DIR)
+    import tkit
+
+    results = {}
+    for name, func, func_args in cases(args.quick):
+        if args.only and name not in args.only:
+            continue
+        for case, value in func(tkit, *func_args):
+            results[case] = value
+            print("{:<36} {:>12.6g}".format(case, value))
+            sys.stdout.flush()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"environment": environment(), "results": results},
+                      f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print()
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
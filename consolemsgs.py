@@ -8,13 +8,20 @@ Author: Garin Wally; 2016
 
 from __future__ import print_function
 
+import atexit
+import functools
+import inspect
 import re
 import sys
+import threading
+import time
 import traceback
+from collections import OrderedDict, deque
 
-import colorama
 from termcolor import cprint, COLORS, colored
 
+import tracing
+
 # Python 3 compatibility
 if sys.version.startswith("3"):
     raw_input = input
@@ -23,12 +30,128 @@ if sys.version.startswith("3"):
 __all__ = ["show_colors",
            "wait",
            "handle_ex",
+           "CallStats",
+           "LiveStatus",
            "nix",
            "nix_process",
+           "progress",
+           "Progress",
            "status",
            "status_process"]
 
-colorama.init()
+# High resolution timer (time.perf_counter is not available in Python 2)
+_clock = getattr(time, "perf_counter", time.time)
+
+
+def _init_console():
+    """Initializes colorama on first output; importing it is slow and not
+    needed by scripts that never print."""
+    global _init_console
+    import colorama
+    colorama.init()
+    _init_console = lambda: None
+    return
+
+
+# =============================================================================
+# OUTPUT
+
+class ConsoleWriter(object):
+    """Writer for console messages.
+
+    Buffering contract: messages are written to sys.stdout's own buffer, so
+    they stay in order with print() and anything else written to stdout.
+    stdout is not flushed per write. It is flushed when the unflushed text
+    reaches `max_pending` characters and, on an interactive console, when a
+    write completes a line (ends in a newline). Anything else, such as a
+    partial "Processing..." line or a redrawn progress line, is flushed by a
+    single background thread at most `interval` seconds after it was
+    written, so logs of long-running scripts stay current. Only flush()
+    flushes at once; call it before writing to stderr (e.g. tracebacks) or
+    to the file descriptor directly, to keep the output in order.
+    """
+    def __init__(self, interval=None, line_flush=None, max_pending=8192):
+        """
+        Args:
+            interval (float): maximum seconds output stays unflushed
+                (default: 0.1 on a terminal, 0.5 otherwise)
+            line_flush (bool): flush when a write completes a line; defaults
+                to True if stdout is a terminal
+            max_pending (int): characters written before stdout is flushed
+        """
+        if line_flush is None:
+            try:
+                line_flush = sys.stdout.isatty()
+            except (AttributeError, ValueError):
+                line_flush = False
+        if interval is None:
+            interval = 0.1 if line_flush else 0.5
+        self.interval = interval
+        self.line_flush = line_flush
+        self.max_pending = max_pending
+        # Characters written since the last flush; approximate across threads
+        self._pending = 0
+        self._dirty = threading.Event()
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._closed = False
+
+    def write(self, text):
+        """Writes text to stdout."""
+        _init_console()
+        # Looked up on each write in case stdout is replaced
+        sys.stdout.write(text)
+        self._pending += len(text)
+        if (self._pending >= self.max_pending or
+                (self.line_flush and text.endswith("\n"))):
+            self.flush()
+        elif not self._dirty.is_set():
+            if self._flusher is None:
+                self._start_flusher()
+            self._dirty.set()
+        return
+
+    def flush(self):
+        """Flushes stdout."""
+        self._pending = 0
+        try:
+            sys.stdout.flush()
+        except (AttributeError, ValueError):
+            # Consoles that do not support flush, or closed at exit
+            pass
+        return
+
+    def close(self):
+        """Flushes stdout and stops the background flusher; called at exit,
+        before Python 2 tears down the modules the flusher uses."""
+        self._closed = True
+        self._dirty.set()
+        self.flush()
+        return
+
+    def _start_flusher(self):
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop,
+                                                 name="ConsoleWriter")
+                self._flusher.daemon = True
+                self._flusher.start()
+        return
+
+    def _flush_loop(self):
+        """Background flusher; one thread per writer."""
+        while not self._closed:
+            self._dirty.wait()
+            time.sleep(self.interval)
+            if self._closed:
+                return
+            self._dirty.clear()
+            self.flush()
+
+
+writer = ConsoleWriter()
+atexit.register(writer.close)
+
 
 # =============================================================================
 # TEXT ATTRIBUTES
@@ -49,15 +172,41 @@ PFX = {
 # =============================================================================
 # UTILS
 
+def _format_seconds(seconds):
+    """Formats a number of seconds as h:mm:ss or m:ss."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+    return "{}:{:02d}".format(minutes, seconds)
+
+
+def _format_elapsed(seconds):
+    """Formats a short duration for OK/FAIL lines."""
+    if seconds < 1:
+        return "{:.0f} ms".format(seconds * 1000)
+    if seconds < 60:
+        return "{:.2f} s".format(seconds)
+    return _format_seconds(seconds)
+
+
+def _elapsed_suffix(elapsed):
+    """Returns ' (12 ms)' for OK/FAIL lines, or '' if elapsed is None."""
+    if elapsed is None:
+        return ""
+    return " ({})".format(_format_elapsed(elapsed))
+
+
 def show_colors():
     """Displays available text colors."""
     all_colors = " ".join([colored(name, name) for name in COLORS.keys()])
-    cprint(all_colors)
+    writer.write(all_colors + "\n")
 
 
 def wait():
     """Python-version agnostic wait-for-input function."""
-    print("\nPress <Enter> to continue")
+    writer.write("\nPress <Enter> to continue\n")
+    writer.flush()
     raw_input()
     return
 
@@ -74,8 +223,8 @@ def handle_ex():
     if exc is not None:
         stackstr += '   {}'.format(traceback.format_exc().lstrip())
     the_err = "".join(stackstr.split("\n")[-2:])
-    print("\n".join(stackstr.split("\n")[:-2]))
-    cprint(the_err, "red", None, ["bold"])
+    writer.write("\n".join(stackstr.split("\n")[:-2]) + "\n")
+    writer.write(colored(the_err, "red", None, ["bold"]) + "\n")
     wait()
     return
 
@@ -124,34 +273,29 @@ class Status(object):
         if self._last_len == 0:
             self._last_len = self._spacing
         # Print the elipses if a processing message shares the line
-        print("".ljust(self._spacing-self._last_len, "."), end="")
-        try:
-            # For consoles that do not support flush
-            sys.stdout.flush()
-        except AttributeError:
-            pass
+        writer.write("".ljust(self._spacing-self._last_len, "."))
 
         # Reset processing message length
         self._last_len = 0
         return
 
-    def success(self):
-        """Print the success message."""
+    def success(self, elapsed=None):
+        """Print the success message, with the elapsed seconds if given."""
         self._place_elipses()
-        print(self._success_msg)
+        writer.write(self._success_msg + _elapsed_suffix(elapsed) + "\n")
 
-    def failure(self):
-        """Print the fail message."""
+    def failure(self, elapsed=None):
+        """Print the fail message, with the elapsed seconds if given."""
         self._place_elipses()
-        print(self._fail_msg)
+        writer.write(self._fail_msg + _elapsed_suffix(elapsed) + "\n")
 
     def custom(self, custom_msg, color='white', wait_for_user=False):
         """Print a custom message."""
         self._place_elipses()
         if color.lower() == "white" or self._disabled_colors:
-            print(custom_msg)
+            writer.write(custom_msg + "\n")
         else:
-            cprint(custom_msg, color, *self.text_attrs)
+            writer.write(colored(custom_msg, color, *self.text_attrs) + "\n")
         if wait_for_user:
             wait()
 
@@ -168,13 +312,7 @@ class Status(object):
         """
         # Save the process message length for use in status object
         self._last_len = len(message)
-        # Print message; flush forces the print to occur
-        print(message, end="")
-        try:
-            # For consoles that do not support flush
-            sys.stdout.flush()
-        except AttributeError:
-            pass
+        writer.write(message)
         return
 
 
@@ -196,29 +334,29 @@ class Nix(object):
         """Take action message from user."""
         self.last_msg = message
 
-        print(self._make("processing"), end="\r")
+        writer.write(self._make("processing") + "\r")
 
-    def ok(self, message=None):
-        """Return the 'OK' message."""
+    def ok(self, message=None, elapsed=None):
+        """Return the 'OK' message, with the elapsed seconds if given."""
         if message:
             self.last_msg = message
-        print(self._make("done"))
+        writer.write(self._make("done") + _elapsed_suffix(elapsed) + "\n")
 
-    def fail(self, message=None):
-        """Return the 'FAIL' message."""
+    def fail(self, message=None, elapsed=None):
+        """Return the 'FAIL' message, with the elapsed seconds if given."""
         if message:
             self.last_msg = message
-        print(self._make("fail"))
+        writer.write(self._make("fail") + _elapsed_suffix(elapsed) + "\n")
 
     def info(self, message):
         """Return an 'INFO' message."""
         self.last_msg = message
-        print(self._make("info"))
+        writer.write(self._make("info") + "\n")
 
     def warn(self, message):
         """Return a 'WARN' message."""
         self.last_msg = message
-        print(self._make("warn"))
+        writer.write(self._make("warn") + "\n")
 
 
 class Message(object):
@@ -230,14 +368,20 @@ class Message(object):
     """
     def __init__(self, message):
         self.message = message
+        self._span = None
 
     def __enter__(self):
         nix.write(self.message)
+        self._span = tracing.span(self.message, "console")
+        self._span.__enter__()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        self._span.__exit__(exc_type, exc_val, exc_tb)
         if exc_tb:
             nix.fail()
             #cprint(''.join(traceback.format_exception_only(type(e), e)), "red", None, ["bold"])
+            # Keep stdout and the stderr traceback in order
+            writer.flush()
             traceback.print_exc()
             raw_input("Press <Enter> to exit")
             return
@@ -245,17 +389,476 @@ class Message(object):
         return
 
 
+class _LiveLine(object):
+    """A worker's line of a LiveStatus; safe to use from any thread."""
+    def __init__(self, live, name):
+        self._live = live
+        self.name = name
+        self.last_msg = name
+
+    def write(self, message):
+        """Shows a processing message on the worker's line."""
+        self.last_msg = message
+        self._live._post(self.name, "processing", message)
+
+    def info(self, message):
+        """Shows an info message on the worker's line."""
+        self.last_msg = message
+        self._live._post(self.name, "info", message)
+
+    def ok(self, message=None):
+        """Finishes the line with an 'OK' result."""
+        self._live._post(self.name, "done", message or self.last_msg)
+
+    def fail(self, message=None):
+        """Finishes the line with a 'FAIL' result."""
+        self._live._post(self.name, "fail", message or self.last_msg)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.ok()
+        else:
+            self.fail()
+
+
+class LiveStatus(object):
+    """Live console status with one line per concurrent worker.
+
+    Workers never write to the console: messages are appended to a queue and
+    a single writer thread redraws the live lines and a summary line at
+    most every `interval` seconds, keeping only the latest message of each
+    worker. Finished lines (OK/FAIL) are printed above the live block. When
+    stdout is not a terminal only the results and summary are printed.
+    Use:
+
+        with LiveStatus() as live:
+            # In each worker thread
+            with live.line('Worker 1') as line:
+                line.write('Downloading...')
+
+    """
+    def __init__(self, interval=0.1, ansi=None):
+        """
+        Args:
+            interval (float): seconds between redraws
+            ansi (bool): redraw live lines with ANSI cursor movement;
+                defaults to True if stdout is a terminal
+        """
+        if ansi is None:
+            try:
+                ansi = sys.stdout.isatty()
+            except (AttributeError, ValueError):
+                ansi = False
+        self.interval = interval
+        self.ansi = ansi
+        self.counts = {"done": 0, "fail": 0}
+        # deque.append is atomic; no lock is needed to post messages
+        self._messages = deque()
+        self._lines = OrderedDict()
+        self._drawn = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def line(self, name):
+        """Returns the live line of a worker."""
+        return _LiveLine(self, name)
+
+    def _post(self, name, pfx, message):
+        self._messages.append((name, pfx, message))
+
+    def start(self):
+        """Starts the writer thread."""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="LiveStatus")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the writer thread after showing all pending messages."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        return
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._render()
+        self._render(final=True)
+        return
+
+    def _render(self, final=False):
+        """Applies queued messages and redraws; writer thread only."""
+        finished = []
+        changed = False
+        while self._messages:
+            name, pfx, message = self._messages.popleft()
+            changed = True
+            if pfx in ("done", "fail"):
+                self._lines.pop(name, None)
+                self.counts[pfx] += 1
+                finished.append(self._format(pfx, message))
+            else:
+                self._lines[name] = (pfx, message)
+        if not changed and not final:
+            return
+        out = []
+        if self.ansi and self._drawn:
+            # Back to the first live line and clear the block
+            out.append("\r\x1b[{}A\x1b[J".format(self._drawn))
+        out.extend(line + "\n" for line in finished)
+        self._drawn = 0
+        if self.ansi or final:
+            if self.ansi and not final:
+                for pfx, message in self._lines.values():
+                    out.append(self._format(pfx, message) + "\n")
+                    self._drawn += 1
+            out.append(self._format("info", "{} running, {} OK, {} FAIL".format(
+                len(self._lines), self.counts["done"], self.counts["fail"])))
+            out.append("\n")
+            self._drawn += 1
+        writer.write("".join(out))
+        writer.flush()
+        return
+
+    def _format(self, pfx, message):
+        return "[{}]  {}".format(PFX[pfx], message)
+
+
+class Progress(object):
+    """Console progress meter (count, percent, rate, ETA and elapsed time).
+
+    A tick only increments a counter; the clock is read every few ticks
+    (adapted to the rate) and the line is redrawn at most every `interval`
+    seconds. Use:
+
+        with Progress('Loading rows', total=len(rows)) as meter:
+            for row in rows:
+                meter.tick()
+
+        for row in progress(rows, 'Loading rows'):
+            load(row)
+
+    The clock starts on start() or, if it was not called, on the first tick.
+    """
+    __slots__ = ("message", "total", "interval", "count", "started",
+                 "_next_check", "_last_draw", "_last_len")
+
+    def __init__(self, message, total=None, interval=0.2):
+        """
+        Args:
+            message (str): text shown after the prefix
+            total (int): number of items; None if unknown
+            interval (float): minimum seconds between redraws
+        """
+        self.message = message
+        self.total = total
+        self.interval = interval
+        self.count = 0
+        self.started = None
+        self._next_check = 1
+        self._last_draw = 0
+        self._last_len = 0
+
+    def tick(self, n=1):
+        """Counts n processed items."""
+        count = self.count = self.count + n
+        if count >= self._next_check:
+            self._check()
+
+    def _check(self):
+        """Redraws if due and sets the count of the next clock read."""
+        if self.started is None:
+            self.start()
+        now = _clock()
+        if now - self._last_draw >= self.interval:
+            self.draw(now)
+        elapsed = now - self.started
+        # Read the clock about four times per interval
+        step = int(self.count / elapsed * self.interval / 4) if elapsed else 1
+        self._next_check = self.count + max(1, step)
+        return
+
+    def format(self, now=None):
+        """Returns the progress text, e.g.
+        'Loading 42% 420/1,000 1,234/s ETA 0:05 (0:02)'."""
+        now = now or _clock()
+        elapsed = now - (now if self.started is None else self.started)
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        parts = [self.message]
+        if self.total:
+            parts.append("{:.0%}".format(min(1.0, float(self.count) /
+                                             self.total)))
+            parts.append("{:,}/{:,}".format(self.count, self.total))
+        else:
+            parts.append("{:,}".format(self.count))
+        parts.append("{:,.0f}/s".format(rate))
+        if self.total and rate:
+            parts.append("ETA {}".format(_format_seconds(
+                max(0, self.total - self.count) / rate)))
+        parts.append("({})".format(_format_seconds(elapsed)))
+        return " ".join(parts)
+
+    def _line(self, pfx, now=None):
+        line = "[{}]  {}".format(PFX[pfx], self.format(now))
+        # Pad to clear the rest of a longer previous line
+        padded = line.ljust(self._last_len)
+        self._last_len = len(line)
+        return padded
+
+    def draw(self, now=None):
+        """Redraws the progress line."""
+        self._last_draw = now or _clock()
+        writer.write(self._line("processing", now) + "\r")
+        return
+
+    def start(self):
+        """Starts the clock and shows the progress line."""
+        self.started = _clock()
+        self.draw(self.started)
+        return self
+
+    def finish(self, ok=True):
+        """Shows the final OK/FAIL line."""
+        writer.write(self._line("done" if ok else "fail") + "\n")
+        return
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        # Leaving a progress() loop early is not a failure
+        self.finish(exc_type is None or issubclass(exc_type, GeneratorExit))
+
+
+def progress(iterable, message="", total=None, interval=0.2):
+    """Yields the items of an iterable while showing a Progress meter.
+    Args:
+        iterable: items to process
+        message (str): text to show
+        total (int): number of items (default: len(iterable) if available)
+        interval (float): minimum seconds between redraws
+    """
+    if total is None and hasattr(iterable, "__len__"):
+        total = len(iterable)
+    with Progress(message, total, interval) as meter:
+        # Count in a local variable; sync with the meter on clock reads
+        count = 0
+        next_check = meter._next_check
+        try:
+            for item in iterable:
+                yield item
+                count += 1
+                if count >= next_check:
+                    meter.count = count
+                    meter._check()
+                    next_check = meter._next_check
+        finally:
+            meter.count = count
+
 
 # =============================================================================
 # DECORATORS
 
-def status_process(func):
+_MSG_LINE = re.compile("(?i)msg:\n(.*)")
+
+_iscoroutinefunction = getattr(inspect, "iscoroutinefunction",
+                               lambda func: False)
+
+
+def _doc_message(func):
+    """Returns the line after 'Msg:' in a function's docstring or its name."""
+    found = _MSG_LINE.search(func.__doc__ or "")
+    if found:
+        return found.group(1).strip()
+    return func.__name__
+
+
+class CallStats(object):
+    """Call statistics of a function wrapped with `stats=True`."""
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.total = 0.0
+        self.fastest = None
+        self.slowest = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed, failed=False):
+        """Records one call."""
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.failures += 1
+            self.total += elapsed
+            if self.fastest is None or elapsed < self.fastest:
+                self.fastest = elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+        return
+
+    @property
+    def mean(self):
+        """Mean seconds per call."""
+        if not self.calls:
+            return 0.0
+        return self.total / self.calls
+
+    def __repr__(self):
+        return "<CallStats calls={} failures={} mean={}>".format(
+            self.calls, self.failures, _format_elapsed(self.mean))
+
+
+class _TimedIterator(object):
+    """Reports a generator (or an __await__ iterator) from first step to end.
+
+    Failures are swallowed like the plain decorators unless `reraise`.
+    """
+    def __init__(self, iterator, begin, finish, reraise):
+        self._iterator = iterator
+        self._begin = begin
+        self._finish = finish
+        self._reraise = reraise
+        self._start = None
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def _step(self, method, *args):
+        if self._start is None:
+            self._begin()
+            self._start = _clock()
+        try:
+            return method(*args)
+        except (StopIteration, GeneratorExit):
+            self._end(False)
+            raise
+        except:  # Naked exception, same as the plain decorators
+            self._end(True)
+            if self._reraise:
+                raise
+            handle_ex()
+            raise StopIteration
+
+    def _end(self, failed):
+        if not self._finished:
+            self._finished = True
+            self._finish(self._start, failed)
+        return
+
+    def __next__(self):
+        # Coroutines have no __next__; send(None) steps both kinds
+        return self._step(self._iterator.send, None)
+
+    next = __next__
+
+    def send(self, value):
+        return self._step(self._iterator.send, value)
+
+    def throw(self, *args):
+        return self._step(self._iterator.throw, *args)
+
+    def close(self):
+        self._iterator.close()
+        if self._start is not None:
+            self._end(False)
+        return
+
+
+class _TimedAwaitable(_TimedIterator):
+    """Coroutine reporting an `async def` call; see _TimedIterator."""
+    def __await__(self):
+        return self
+
+
+try:
+    from collections.abc import Coroutine
+    # asyncio.run() and ensure_future() only accept coroutines
+    Coroutine.register(_TimedAwaitable)
+except ImportError:  # Python 2
+    pass
+
+
+def _mark_coroutine_function(wrapper):
+    """Marks a plain function returning a coroutine as a coroutine function,
+    so callers such as tkit's add_button await its result instead of
+    calling it and dropping the coroutine."""
+    # Checked by tkit._is_coroutine_function
+    wrapper._coroutine_function = True
+    # Python 3.12+: also recognized by inspect.iscoroutinefunction
+    mark = getattr(inspect, "markcoroutinefunction", None)
+    if mark is not None:
+        mark(wrapper)
+    return
+
+
+def _process_decorator(func, begin, end, stats, reraise):
+    """Wraps func so that each call is reported by begin(msg) and
+    end(msg, elapsed, failed), and traced if tracing is enabled.
+    The message is resolved once, here."""
+    msg = _doc_message(func)
+    call_stats = CallStats() if stats else None
+
+    def announce():
+        begin(msg)
+
+    def finish(start, failed):
+        elapsed = _clock() - start
+        if call_stats is not None:
+            call_stats.add(elapsed, failed)
+        if tracing.enabled:
+            tracing.complete(msg, "console", start, elapsed,
+                             {"failed": True} if failed else None)
+        end(msg, elapsed, failed)
+
+    if inspect.isgeneratorfunction(func):
+        def wrapper(*args, **kwargs):
+            return _TimedIterator(func(*args, **kwargs), announce, finish,
+                                  reraise)
+    elif _iscoroutinefunction(func):
+        def wrapper(*args, **kwargs):
+            return _TimedAwaitable(func(*args, **kwargs), announce, finish,
+                                   reraise)
+        _mark_coroutine_function(wrapper)
+    else:
+        def wrapper(*args, **kwargs):
+            begin(msg)
+            start = _clock()
+            try:
+                out = func(*args, **kwargs)
+            except:  # Naked exception, who knows what will come through that door
+                finish(start, True)
+                if reraise:
+                    raise
+                handle_ex()
+                return None
+            finish(start, False)
+            return out
+    wrapper = functools.wraps(func)(wrapper)
+    wrapper.stats = call_stats
+    return wrapper
+
+
+def status_process(func=None, stats=False, reraise=False):
     """Wraps a process/function with naked try/except and 'Status' messages.
     Args:
-        func (function): function to be wrapped
+        func (function): function, generator or coroutine function
+        stats (bool): keep a CallStats on `wrapper.stats`
+        reraise (bool): re-raise exceptions instead of handling them
     Returns a process/function decorated with Status-style messages.
     Use:
-        >>> @status_decorator
+        >>> @status_process
         >>> def my_process():
         >>>     '''My doc.
         >>>     Msg:
@@ -263,56 +866,38 @@ def status_process(func):
         >>>     import time
         >>>     time.sleep(2)
         >>>     return "Some Value"  # This won't usually print
-        Doing stuff.............................[1m[32m[DONE][0m
+        Doing stuff.............................[1m[32m[DONE][0m (2.00 s)
         'Some Value'
 
+    Options are given as `@status_process(stats=True)`.
     """
+    if func is None:
+        return functools.partial(status_process, stats=stats, reraise=reraise)
     status = Status()
 
-    def wrapper(*args, **kwargs):
-        try:
-            if func.__doc__ and re.findall("(?i)msg:", func.__doc__):
-                d = func.__doc__
-                msg = re.findall("(?i)msg:\n(.*)", d)[0].lstrip()
-            else:
-                msg = func.__name__
-            status.write(msg)
-            # Execute wrapped function
-            out = func(*args, **kwargs)
-            status.success()
-        except:  # Naked exception, who knows what will come through that door
-            status.failure()
-            handle_ex()
-        try:
-            return out
-        except UnboundLocalError:
-            pass
-    return wrapper
+    def end(msg, elapsed, failed):
+        if failed:
+            status.failure(elapsed)
+        else:
+            status.success(elapsed)
 
+    return _process_decorator(func, status.write, end, stats, reraise)
 
-def nix_process(func):
-    """Wraps a function with naked try/except and cli.StatusLine messages."""
+
+def nix_process(func=None, stats=False, reraise=False):
+    """Wraps a function with naked try/except and cli.StatusLine messages.
+    Takes the same options as status_process."""
+    if func is None:
+        return functools.partial(nix_process, stats=stats, reraise=reraise)
     nix = Nix()
 
-    def wrapper(*args, **kwargs):
-        try:
-            if func.__doc__ and re.findall("(?i)msg:", func.__doc__):
-                d = func.__doc__
-                msg = re.findall("(?i)msg:\n(.*)", d)[0].lstrip()
-            else:
-                msg = func.__name__
-            nix.write(msg)
-            # Execute wrapped function
-            out = func(*args, **kwargs)
-            nix.ok()
-        except:  # Naked exception, who knows what will come through that door
-            nix.fail()
-            handle_ex()
-        try:
-            return out
-        except UnboundLocalError:
-            pass
-    return wrapper
+    def end(msg, elapsed, failed):
+        if failed:
+            nix.fail(msg, elapsed)
+        else:
+            nix.ok(msg, elapsed)
+
+    return _process_decorator(func, nix.write, end, stats, reraise)
 
 
 # =============================================================================
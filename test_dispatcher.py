@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+test_dispatcher.py
+
+Tests that tkit.Dispatcher runs callables submitted by worker threads on
+the main thread, in the order they were submitted, and that it stops when
+its root is destroyed. Runs without a display: the root is a Tcl
+interpreter without Tk, so the after() calls and the main loop are real.
+License: MIT
+"""
+
+from __future__ import print_function
+
+import threading
+import time
+
+import tkit
+
+tk = tkit.tk
+
+
+class Root(tk.Tk):
+    """Display-free root; bindings are kept here since Tcl has no bind."""
+    def __init__(self):
+        tk.Tk.__init__(self, useTk=False)
+        self.bindings = {}
+
+    def bind(self, sequence=None, func=None, add=None):
+        self.bindings.setdefault(sequence, []).append(func)
+        return str(id(func))
+
+    def destroy(self):
+        event = tk.Event()
+        event.widget = self
+        for func in self.bindings.get("<Destroy>", []):
+            func(event)
+        return
+
+    def pending_afters(self):
+        return self.tk.splitlist(self.tk.call("after", "info"))
+
+
+def run_until(root, done, timeout=10.0):
+    """Runs the Tcl event loop until done() is true or timeout seconds
+    pass. (mainloop() returns at once when there is no Tk window.)"""
+    deadline = time.time() + timeout
+    while not done() and time.time() < deadline:
+        # Wakes the loop up in case nothing else is scheduled
+        tick = root.after(10, lambda: None)
+        root.tk.dooneevent()
+        root.after_cancel(tick)
+    return
+
+
+def check_order_and_thread(workers=8, per_worker=500):
+    """Calls submitted from several threads run on the main thread, in the
+    order they were submitted."""
+    root = Root()
+    dispatcher = tkit.Dispatcher(root, interval=5, batch_size=100)
+    dispatcher.start()
+    main = threading.current_thread()
+    ran = []
+    counter = [0]
+    order = threading.Lock()
+
+    def call(number):
+        ran.append((number, threading.current_thread() is main))
+
+    def work():
+        for _ in range(per_worker):
+            # Numbers the calls in the order they are submitted
+            with order:
+                dispatcher.submit(call, counter[0])
+                counter[0] += 1
+
+    threads = [threading.Thread(target=work) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    total = workers * per_worker
+    run_until(root, lambda: len(ran) == total)
+    for thread in threads:
+        thread.join()
+    assert [number for number, _ in ran] == list(range(total))
+    assert all(on_main for _, on_main in ran)
+    assert dispatcher.stats["submitted"] == total, dispatcher.stats
+    assert dispatcher.stats["executed"] == total, dispatcher.stats
+    dispatcher.stop()
+    print("{} calls from {} threads ran in order on the main thread".format(
+        total, workers))
+    return
+
+
+def check_stops_on_destroy():
+    """Destroying the root cancels the drain instead of rescheduling it."""
+    root = Root()
+    dispatcher = tkit.Dispatcher(root, interval=5)
+    dispatcher.start()
+    run_until(root, lambda: dispatcher.stats["last_drain"] > 0)
+    assert root.pending_afters()
+    root.destroy()
+    assert dispatcher._after_id is None
+    assert not root.pending_afters(), root.pending_afters()
+    print("Dispatcher stops when its root is destroyed")
+    return
+
+
+def check_stop_from_callable():
+    """A dispatched callable that stops the dispatcher (as App.close does)
+    is not followed by another drain."""
+    root = Root()
+    dispatcher = tkit.Dispatcher(root, interval=5)
+    dispatcher.start()
+    dispatcher.submit(dispatcher.stop)
+    run_until(root, lambda: dispatcher.stats["executed"] == 1)
+    assert not root.pending_afters(), root.pending_afters()
+    print("Dispatcher stays stopped when stopped by a dispatched callable")
+    return
+
+
+if __name__ == "__main__":
+    check_order_and_thread()
+    check_stops_on_destroy()
+    check_stop_from_callable()
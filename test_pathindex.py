@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+test_pathindex.py
+
+Tests the path index behind tkit.FileTree: positional access after removals,
+and that the cost of a removal stays flat as the tree grows.
+License: MIT
+"""
+
+from __future__ import print_function
+
+import random
+import time
+
+import tkit
+
+_clock = getattr(time, "perf_counter", time.time)
+
+
+def check_matches_list():
+    """Positions, slices and index() agree with a plain list."""
+    rng = random.Random(0)
+    index = tkit._PathIndex()
+    model = []
+    for step in range(20000):
+        if model and rng.random() < 0.45:
+            path = model.pop(rng.randrange(len(model)))
+            index.remove(path)
+        else:
+            path = "/folder/file{}.txt".format(step)
+            index.add(path)
+            model.append(path)
+        if step % 97 == 0 and model:
+            position = rng.randrange(len(model))
+            assert index[position] == model[position]
+            assert index[-1] == model[-1]
+            assert index[position:position + 30] == model[position:
+                                                          position + 30]
+            assert index.index(model[position]) == position
+    assert list(index) == model
+    assert len(index) == len(model)
+    print("Path index matches a list")
+    return
+
+
+def removal_cost(n):
+    """Seconds per removal of the first row, as FileTree does in virtual
+    mode (remove the focused row, then render the visible rows)."""
+    index = tkit._PathIndex()
+    index.extend("/folder{}/file{}.txt".format(i // 100, i)
+                 for i in range(n))
+    start = _clock()
+    while len(index):
+        path = index[0]
+        index.remove(path)
+        index[0:40]
+    return (_clock() - start) / n
+
+
+def check_removal_cost_flat():
+    """Per-removal cost at 64k paths is close to the cost at 4k; a
+    quadratic removal would be 16 times slower."""
+    small = min(removal_cost(4000) for _ in range(3))
+    large = min(removal_cost(64000) for _ in range(3))
+    print("Removal: {:.2f} us at 4k paths, {:.2f} us at 64k paths".format(
+        small * 1e6, large * 1e6))
+    assert large < small * 4, "removal cost grows with the number of paths"
+    return
+
+
+if __name__ == "__main__":
+    check_matches_list()
+    check_removal_cost_flat()
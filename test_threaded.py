@@ -7,24 +7,27 @@ Author: Garin Wally; Oct 2017
 License: MIT
 """
 
-import time
 import itertools
-import threading
-import Tkinter as tk
-
-import tkit
 
+try:
+    import tkinter as tk
+except ImportError:
+    import Tkinter as tk
 
-STOP = threading.Event()
+import tkit
 
 
 def sleep():
     """A worker simulating a long process."""
     print("Sleeping...")
-    time.sleep(8)
+    token = tkit.current_token()
+    if token.wait(8):
+        print("Sleep cancelled")
+        return
     print("Done sleeping")
-    STOP.set()
-    spinner.stop()
+    # Stops the other workers of the group, if started as one
+    if token.parent is not None:
+        token.parent.cancel()
     return
 
 
@@ -35,9 +38,9 @@ def do_stuff():
 
 def w_loop():
     """A worker simulating a looping process."""
-    while not STOP.is_set():
+    token = tkit.current_token()
+    while not token.wait(.75):
         print("Still looping...")
-        time.sleep(.75)
 
 
 def some_process(self):
@@ -47,12 +50,15 @@ def some_process(self):
     label.pack()
     self.update()
 
-    # Starts these functions and moves on
-    tkit.thread_tasks([w_loop, sleep, do_stuff])
+    # Starts these functions and the spinner, and moves on
+    # The spinner's Cancel button cancels the token of all three
+    token = tkit.CancelToken()
+    futures = tkit.thread_tasks([w_loop, sleep, do_stuff], spinner,
+                                token=token)
 
-    self.start_spinner() # Hangs here until sleep sets the STOP event
-    label.config(text="Done.")
-    self.update()
+    # Workers must not touch widgets; update the label on the UI thread
+    futures[1].add_done_callback(
+        lambda future: self.dispatch_config(label, text="Done."))
     return
 
 
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+test_watchdog.py
+
+Tests how tkit.Watchdog names the Tk callback a stall happened in.
+Runs without a display: Tk callbacks are called through tk.CallWrapper
+directly, as Tk would call them.
+License: MIT
+"""
+
+from __future__ import print_function
+
+import functools
+import sys
+
+import tkit
+
+CallWrapper = tkit.tk.CallWrapper
+
+
+def sample():
+    """Returns the callback the watchdog would blame right now."""
+    return tkit._running_callback(sys._getframe())
+
+
+def check_nested_callbacks():
+    """A callback run by a nested event loop (update() inside a command)
+    is blamed, not the command that started the loop."""
+    found = []
+
+    def inner():
+        found.append(sample())
+
+    def outer():
+        found.append(sample())
+        # What update() does when it runs a pending callback
+        CallWrapper(inner, None, None)()
+
+    CallWrapper(outer, None, None)()
+    assert found == ["outer", "inner"], found
+    assert sample() is None
+    print("Nested callbacks: {}".format(found))
+    return
+
+
+def check_unnamed_callbacks():
+    """Partials and callable objects are named by their repr."""
+    found = []
+
+    class Command(object):
+        def __call__(self):
+            found.append(sample())
+
+    def command(value):
+        found.append(sample())
+
+    CallWrapper(functools.partial(command, 1), None, None)()
+    CallWrapper(Command(), None, None)()
+    assert "partial" in found[0], found
+    assert "Command object" in found[1], found
+    print("Unnamed callbacks: {}".format(found))
+    return
+
+
+if __name__ == "__main__":
+    check_nested_callbacks()
+    check_unnamed_callbacks()
@@ -18,24 +18,116 @@ try:
 except ImportError:
     import Tkinter as tk
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        # Python 2 backport
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+import fnmatch
+import fractions
+import hashlib
+import importlib
+import json
+import itertools
 import os
 import re
+import sys
 import time
-import ttk
-import tkMessageBox
-import tkFileDialog
 import threading
+import traceback
 import logging
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
 from time import sleep
-from tkSimpleDialog import askinteger, askstring, askfloat
 from types import MethodType
 
+try:
+    import ttk
+except ImportError:
+    from tkinter import ttk
+
+import tracing
+
+
+class _LazyModule(object):
+    """Stands in for a module that is only imported on first attribute access.
+    Dialogs, multiprocessing and asyncio are slow to import and not needed by
+    most scripts.
+    """
+    def __init__(self, *names):
+        """
+        Args:
+            names (str): module names to try in order (e.g. Python 2 and 3)
+        """
+        self._names = names
+        self._module = None
+        self._stubs = {}
+
+    def stub(self, attr, value):
+        """Replaces a module attribute, for tkit code only; see Replayer."""
+        self._stubs[attr] = value
+        return
+
+    def unstub(self, *attrs):
+        """Removes stubs set by stub()."""
+        for attr in attrs:
+            self._stubs.pop(attr, None)
+        return
+
+    def __getattr__(self, attr):
+        if attr in self._stubs:
+            return self._stubs[attr]
+        if self._module is None:
+            for name in self._names:
+                try:
+                    self._module = importlib.import_module(name)
+                    break
+                except ImportError:
+                    if name == self._names[-1]:
+                        raise
+        return getattr(self._module, attr)
+
+
+tkMessageBox = _LazyModule("tkMessageBox", "tkinter.messagebox")
+tkFileDialog = _LazyModule("tkFileDialog", "tkinter.filedialog")
+tkSimpleDialog = _LazyModule("tkSimpleDialog", "tkinter.simpledialog")
+multiprocessing = _LazyModule("multiprocessing")
+pickle = _LazyModule("cPickle", "pickle")
+inspect = _LazyModule("inspect")
+# Not available in Python 2; coroutine callbacks are not supported there
+asyncio = _LazyModule("asyncio")
+
+
+def askinteger(*args, **kwargs):
+    """tkSimpleDialog.askinteger; the dialog module is imported on use."""
+    return tkSimpleDialog.askinteger(*args, **kwargs)
+
+
+def askstring(*args, **kwargs):
+    """tkSimpleDialog.askstring; the dialog module is imported on use."""
+    return tkSimpleDialog.askstring(*args, **kwargs)
+
+
+def askfloat(*args, **kwargs):
+    """tkSimpleDialog.askfloat; the dialog module is imported on use."""
+    return tkSimpleDialog.askfloat(*args, **kwargs)
+
 
 # Location of module
 _DIR = os.path.dirname(__file__)
+# Icons directory
+ICONS = os.path.join(_DIR, "Icons")
 # Open folder icon
-OPENFOLDER = os.path.join(_DIR, "icons/openfolder.gif").replace("\\", "/")
+OPENFOLDER = os.path.join(ICONS, "openfolder.gif").replace("\\", "/")
 
 
 def NULL_ACTION(*args, **kwargs):
@@ -47,6 +139,42 @@ def _clean_name(name):
     return re.sub("[\W]", "", name.lower().replace(" ", "_"))
 
 
+def _traced_command(name, func):
+    """Wraps a widget command so its calls are traced if tracing is enabled.
+    The flag is checked per call, so tracing can be enabled at any time."""
+    def command(*args):
+        if not tracing.enabled:
+            return func(*args)
+        with tracing.span(name, "ui"):
+            return func(*args)
+    # Named in Watchdog stall reports
+    command._command_name = name
+    return command
+
+
+def _cpu_count():
+    """Returns the number of CPUs without importing multiprocessing."""
+    try:
+        return os.cpu_count() or 1
+    except AttributeError:
+        pass
+    try:
+        return int(os.environ["NUMBER_OF_PROCESSORS"])
+    except (KeyError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_NPROCESSORS_ONLN")
+    except (AttributeError, ValueError, OSError):
+        return 1
+
+
+# Default number of worker threads per pool
+DEFAULT_WORKERS = min(32, _cpu_count() + 4)
+
+# High resolution timer (time.perf_counter is not available in Python 2)
+_clock = getattr(time, "perf_counter", time.time)
+
+
 # ==============================================================================
 # THREADING
 
@@ -63,47 +191,1461 @@ def threaded_gui(app):  # TODO: not start immediately...
     gui.join()
 
 
-def thread_tasks(tasks, target=None):
-    """Starts all functions in a list as threads.
+def thread_tasks(tasks, target=None, pool=None, token=None, timeout=None):
+    """Runs all functions in a list on a bounded pool of worker threads.
     Args:
-        tasks (list): list of functions to start as threads
-        target: a progress widget
+        tasks (list): list of functions to run
+        target: a progress widget; stopped once all tasks have finished
+        pool (WorkerPool): pool to run the tasks on (default: a shared pool)
+        token (CancelToken): cancels all tasks; the target shows a Cancel
+            button for it
+        timeout (float): seconds each task may take
+    Tasks get their CancelToken from current_token().
+    Returns a list of Futures, one per task.
+    """
+    if pool is None:
+        pool = _default_pool()
+    futures = [pool.submit_task(task, token=token, timeout=timeout)
+               for task in tasks]
+    if target is None or not futures:
+        return futures
+
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def task_done(future):
+        with lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            target.stop()
+        return
+
+    for future in futures:
+        future.add_done_callback(task_done)
+    if token is None:
+        target.run()
+    else:
+        target.run(token=token)
+    return futures
+
+
+def _dispatcher_for(widget):
+    """Returns the Dispatcher of the app that owns a widget, or None."""
+    try:
+        return widget._root().dispatcher
+    except AttributeError:
+        return None
+
+
+def _ui_call(widget, func, *args, **kwargs):
+    """Calls func on the UI thread of the app that owns widget.
+    Calls made from the main thread, or for widgets outside of an App, run
+    immediately.
+    """
+    dispatcher = _dispatcher_for(widget)
+    if dispatcher is None or dispatcher.in_main_thread():
+        return func(*args, **kwargs)
+    dispatcher.submit(func, *args, **kwargs)
+    return
+
+
+def _when_done(widget, future, func, interval=50):
+    """Calls func(future) on the UI thread once the future is done.
+    Inside an App the call is queued on its Dispatcher when the future
+    finishes; outside of one (no Dispatcher) the future is polled with
+    widget.after() every interval ms.
     """
-    def delay_end(target, threads):
-        if target is None:
+    dispatcher = _dispatcher_for(widget)
+    if dispatcher is not None:
+        future.add_done_callback(lambda future: dispatcher.submit(func, future))
+        return
+    _poll_done(widget, future, func, interval)
+    return
+
+
+def _poll_done(widget, future, func, interval):
+    if future.done():
+        func(future)
+        return
+    widget.after(interval, _poll_done, widget, future, func, interval)
+    return
+
+
+class Dispatcher(object):
+    """Thread-safe queue of UI callables that is drained by the Tk main loop.
+
+    Tk is not thread-safe; worker threads submit callables (or widget
+    configuration changes) here and the main loop executes them in batches.
+    Repeated .configure() calls for the same widget option are merged so that
+    only the most recent value is applied. Draining stops when the root is
+    destroyed.
+    """
+    def __init__(self, root, interval=20, batch_size=500):
+        """
+        Args:
+            root: the Tk root that drains the queue
+            interval (int): milliseconds between drains
+            batch_size (int): maximum number of callables run per drain
+        """
+        self.root = root
+        self.interval = interval
+        self.batch_size = batch_size
+        self._queue = deque()
+        self._configs = {}
+        self._lock = threading.Lock()
+        self._main_thread = threading.current_thread()
+        self._after_id = None
+        self._running = False
+        self._destroy_binding = None
+        self.stats = {"submitted": 0, "merged": 0, "executed": 0,
+                      "errors": 0, "max_depth": 0,
+                      "last_latency": 0.0, "max_latency": 0.0,
+                      "last_drain": 0.0}
+
+    @property
+    def depth(self):
+        """Number of callables waiting to be executed."""
+        return len(self._queue)
+
+    def in_main_thread(self):
+        """Returns True if called from the thread that runs the main loop."""
+        return threading.current_thread() is self._main_thread
+
+    def start(self):
+        """Starts draining the queue from the main loop."""
+        self._running = True
+        if self._destroy_binding is None:
+            self._destroy_binding = self.root.bind(
+                "<Destroy>", self._on_destroy, add="+")
+        if self._after_id is None:
+            self._after_id = self.root.after(self.interval, self._drain)
+        return
+
+    def _on_destroy(self, event):
+        # The root's bindings also fire for each destroyed child widget
+        if event.widget is self.root:
+            self.stop()
+        return
+
+    def stop(self):
+        """Stops draining the queue."""
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        return
+
+    def submit(self, func, *args, **kwargs):
+        """Queues a callable to be executed on the UI thread."""
+        with self._lock:
+            self._queue.append((_clock(), func, args, kwargs))
+            self.stats["submitted"] += 1
+            depth = len(self._queue)
+            if depth > self.stats["max_depth"]:
+                self.stats["max_depth"] = depth
+        return
+
+    def configure(self, widget, **options):
+        """Queues widget.config(**options); repeated options are merged."""
+        with self._lock:
+            pending = self._configs.get(widget)
+            if pending is not None:
+                self.stats["merged"] += len(set(pending) & set(options))
+                pending.update(options)
+                return
+            self._configs[widget] = dict(options)
+        self.submit(self._apply_config, widget)
+        return
+
+    def _apply_config(self, widget):
+        with self._lock:
+            options = self._configs.pop(widget, None)
+        if options:
+            widget.config(**options)
+        return
+
+    def _drain(self):
+        """Executes a batch of queued callables; runs on the main loop."""
+        self._after_id = None
+        start = _clock()
+        executed = 0
+        while self._queue and executed < self.batch_size:
+            queued, func, args, kwargs = self._queue.popleft()
+            latency = start - queued
+            self.stats["last_latency"] = latency
+            if latency > self.stats["max_latency"]:
+                self.stats["max_latency"] = latency
+            try:
+                func(*args, **kwargs)
+            except Exception:
+                self.stats["errors"] += 1
+                logging.exception("Dispatched UI callable failed")
+            executed += 1
+        self.stats["executed"] += executed
+        self.stats["last_drain"] = _clock() - start
+        # A callable may have stopped the dispatcher, e.g. by closing the app
+        if self._running:
+            # Drain again immediately if the batch limit was reached
+            self._after_id = self.root.after(
+                0 if self._queue else self.interval, self._drain)
+        return
+
+
+class CancelledError(Exception):
+    """Raised when the result of a cancelled Future is requested."""
+    pass
+
+
+class TaskTimeoutError(Exception):
+    """Raised when a Future does not finish in the given time."""
+    pass
+
+
+class CancelToken(object):
+    """Cooperative cancellation of background tasks.
+
+    A task checks its token at safe points (`check()` raises CancelledError)
+    and waits with `wait()` instead of sleeping, so it stops promptly and can
+    release its resources. A token can cancel itself after a timeout or at a
+    deadline, and a child token is cancelled with its parent. Tasks run by
+    a WorkerPool or ThreadedClient get their token from current_token().
+    """
+    def __init__(self, timeout=None, deadline=None, parent=None):
+        """
+        Args:
+            timeout (float): seconds until the token cancels itself
+            deadline (float): time.time() at which the token cancels itself
+            parent (CancelToken): token whose cancellation cancels this one
+        """
+        self.reason = None
+        self.parent = parent
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self._timer = None
+        self._deadline = None
+        if timeout is not None:
+            self._deadline = _clock() + timeout
+        if deadline is not None:
+            self._earlier_deadline(_clock() + deadline - time.time())
+        if parent is not None:
+            self._earlier_deadline(parent._deadline)
+            parent._on_cancel(self._parent_cancelled)
+
+    def __repr__(self):
+        return "<CancelToken {}>".format(self.reason or "active")
+
+    def _earlier_deadline(self, deadline):
+        if deadline is not None and (self._deadline is None or
+                                     deadline < self._deadline):
+            self._deadline = deadline
+        return
+
+    def _parent_cancelled(self, parent):
+        self.cancel(parent.reason)
+        return
+
+    def _on_cancel(self, func):
+        """Adds a callback without starting a deadline timer."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(func)
+                return
+        func(self)
+        return
+
+    def add_callback(self, func):
+        """Calls func(token) once the token is cancelled, in the thread that
+        cancels it (a timer thread if the deadline passes first)."""
+        self._on_cancel(func)
+        remaining = self.remaining()
+        with self._lock:
+            if (remaining is not None and self._timer is None and
+                    not self._event.is_set()):
+                self._timer = threading.Timer(remaining, self.cancel,
+                                              ("timeout",))
+                self._timer.daemon = True
+                self._timer.start()
+        return
+
+    def cancel(self, reason="cancelled"):
+        """Cancels the token and its children; later calls do nothing."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        if self._timer is not None:
+            self._timer.cancel()
+        for func in callbacks:
+            try:
+                func(self)
+            except Exception:
+                logging.exception("Cancel callback failed")
+        return
+
+    def _detach(self):
+        """Stops following the parent; called when the task is done."""
+        if self.parent is not None:
+            with self.parent._lock:
+                try:
+                    self.parent._callbacks.remove(self._parent_cancelled)
+                except ValueError:
+                    pass
+        if self._timer is not None:
+            self._timer.cancel()
+        return
+
+    def remaining(self):
+        """Seconds until the deadline, or None if there is none."""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - _clock())
+
+    @property
+    def cancelled(self):
+        """True once cancelled or past the deadline."""
+        if (not self._event.is_set() and self._deadline is not None and
+                _clock() >= self._deadline):
+            self.cancel("timeout")
+        return self._event.is_set()
+
+    @property
+    def timed_out(self):
+        """True if the token was cancelled by its timeout or deadline."""
+        return self.reason == "timeout"
+
+    def check(self):
+        """Raises CancelledError if the token is cancelled."""
+        if self.cancelled:
+            raise CancelledError(self.reason)
+        return
+
+    def wait(self, seconds=None):
+        """Sleeps for up to seconds (None: until cancelled), waking up as
+        soon as the token is cancelled. Returns True if it is cancelled."""
+        remaining = self.remaining()
+        if remaining is not None and (seconds is None or remaining < seconds):
+            seconds = remaining
+        self._event.wait(seconds)
+        return self.cancelled
+
+
+_task_context = threading.local()
+
+
+def current_token():
+    """Returns the CancelToken of the task running in this thread; outside of
+    a task, a token that is never cancelled."""
+    future = getattr(_task_context, "future", None)
+    if future is not None:
+        return future._get_token()
+    token = getattr(_task_context, "token", None)
+    if token is None:
+        return CancelToken()
+    return token
+
+
+class Future(object):
+    """The eventual result (or error) of a task submitted to a WorkerPool."""
+    def __init__(self, dispatcher=None):
+        """
+        Args:
+            dispatcher (Dispatcher): if given, done-callbacks are delivered on
+                the UI thread through it
+        """
+        self._dispatcher = dispatcher
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._state = "pending"
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        # Asks the running task to stop; created on first use
+        self.token = None
+
+    def __repr__(self):
+        return "<Future {}>".format(self._state)
+
+    def cancel(self):
+        """Cancels the task. A pending task is dropped at once; a running
+        task is asked to stop through its CancelToken.
+        Returns False if the task has already finished."""
+        with self._lock:
+            state = self._state
+            if state == "pending":
+                self._state = "cancelled"
+        if state == "pending":
+            self._finish()
+            if self.token is not None:
+                self.token.cancel()
+            return True
+        if state == "running":
+            self._get_token().cancel()
+            return True
+        return state == "cancelled"
+
+    def cancelled(self):
+        return self._state == "cancelled"
+
+    def running(self):
+        return self._state == "running"
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Waits for and returns the task's result; re-raises its error."""
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Waits for the task and returns its exception (or None)."""
+        self._wait(timeout)
+        return self._exception
+
+    def add_done_callback(self, func):
+        """Calls func(future) once the task is done, failed or cancelled."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(func)
+                return
+        self._invoke(func)
+        return
+
+    def _wait(self, timeout):
+        if not self._done.wait(timeout):
+            raise TaskTimeoutError("Task did not finish in {}s".format(timeout))
+        if self._state == "cancelled":
+            raise CancelledError()
+
+    def _get_token(self):
+        """Returns the task's CancelToken, creating it on first use."""
+        with self._lock:
+            if self.token is None:
+                self.token = CancelToken()
+            return self.token
+
+    def _set_running(self):
+        with self._lock:
+            if self._state != "pending":
+                return False
+            self._state = "running"
+        return True
+
+    def _set_result(self, result):
+        self._result = result
+        self._state = "finished"
+        self._finish()
+
+    def _set_exception(self, exception):
+        self._exception = exception
+        self._state = "finished"
+        self._finish()
+
+    def _set_cancelled(self, token):
+        """Finishes a task that stopped because its token was cancelled."""
+        if token is not None and token.timed_out:
+            self._set_exception(TaskTimeoutError("Task did not finish in time"))
+            return
+        self._state = "cancelled"
+        self._finish()
+
+    def _finish(self):
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for func in callbacks:
+            self._invoke(func)
+
+    def _invoke(self, func):
+        if self._dispatcher is not None:
+            self._dispatcher.submit(func, self)
             return
-        while any([t.is_alive() for t in threads]):
-            time.sleep(.2)
-        target.stop()
+        try:
+            func(self)
+        except Exception:
+            logging.exception("Future callback failed")
+
+
+class WorkerPool(object):
+    """A bounded pool of daemon worker threads that runs submitted tasks.
+
+    Threads are only started as tasks arrive and never exceed `workers`, no
+    matter how many tasks are submitted. Note that tasks which wait on other
+    tasks of the same pool can deadlock if the pool is too small.
+    """
+    def __init__(self, workers=4, name="Worker", dispatcher=None,
+                 max_pending=0):
+        """
+        Args:
+            workers (int): maximum number of worker threads
+            name (str): prefix of the worker thread names
+            dispatcher (Dispatcher): delivers done-callbacks on the UI thread
+            max_pending (int): maximum number of queued tasks (0: no limit);
+                submitting more raises queue.Full
+        """
+        self.workers = max(1, workers)
+        self.name = name
+        self.dispatcher = dispatcher
+        self._tasks = queue.Queue(max_pending)
+        self._threads = []
+        self._idle = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    @property
+    def busy(self):
+        """True while tasks are queued or running."""
+        with self._lock:
+            return not self._tasks.empty() or self._idle < len(self._threads)
+
+    def submit(self, func, *args, **kwargs):
+        """Queues func(*args, **kwargs) and returns its Future."""
+        return self.submit_task(func, args, kwargs)
+
+    def submit_task(self, func, args=(), kwargs=None, token=None,
+                    timeout=None, deadline=None):
+        """Queues func(*args, **kwargs) with cancellation options.
+        Args:
+            token (CancelToken): cancels this task (and others sharing it)
+            timeout (float): seconds from now, including time in the queue
+            deadline (float): time.time() by which the task must finish
+        The task gets its own CancelToken from current_token(); cancelling
+        the Future cancels it. A task that stops with token.check() ends as
+        cancelled, or with TaskTimeoutError after its timeout or deadline.
+        The token is only created up front if one of the options is given.
+        Returns a Future.
+        """
+        if self._shutdown:
+            raise RuntimeError("Cannot submit tasks after shutdown")
+        future = Future(self.dispatcher)
+        if token is not None or timeout is not None or deadline is not None:
+            future.token = CancelToken(timeout, deadline, token)
+            # Drops the task at once if it is cancelled while queued
+            future.token._on_cancel(lambda token: future.cancel())
+        self._tasks.put_nowait((future, func, args, kwargs or {}))
+        self._adjust_threads()
+        return future
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """Stops the workers once the queued tasks are done.
+        Args:
+            wait (bool): block until all workers have exited
+            cancel_pending (bool): cancel tasks that have not started yet
+        """
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+        if cancel_pending:
+            while True:
+                try:
+                    item = self._tasks.get_nowait()
+                except queue.Empty:
+                    break
+                item[0].cancel()
+        for _ in threads:
+            self._tasks.put(None)
+        if wait:
+            for t in threads:
+                t.join()
         return
 
-    for task in tasks:
-        threads = []
-        t = threading.Thread(target=task)
-        t.daemon = True
-        threads.append(t)
+    def _adjust_threads(self):
+        """Starts a worker if none are idle and the limit allows it."""
+        with self._lock:
+            if self._idle >= self._tasks.qsize():
+                return
+            if len(self._threads) >= self.workers:
+                return
+            t = threading.Thread(
+                target=self._work,
+                name="{}-{}".format(self.name, next(self._ids)))
+            t.daemon = True
+            self._threads.append(t)
         t.start()
-    end = threading.Thread(target=delay_end, args=(target, threads))
-    end.start()
-    if target:
-        target.run()
+        return
+
+    def _work(self):
+        """Worker thread loop."""
+        try:
+            while True:
+                with self._lock:
+                    self._idle += 1
+                item = self._tasks.get()
+                with self._lock:
+                    self._idle -= 1
+                if item is None:
+                    return
+                self._run(*item)
+        finally:
+            # A thread that has exited must not count as busy
+            with self._lock:
+                self._threads.remove(threading.current_thread())
+
+    def _run(self, future, func, args, kwargs):
+        """Runs one task and completes its Future."""
+        if not future._set_running():
+            if future.token is not None:
+                future.token._detach()
+            return
+        _task_context.future = future
+        try:
+            # Cancelled or past its deadline while queued
+            if future.token is not None:
+                future.token.check()
+            with tracing.span(getattr(func, "__name__", repr(func))):
+                result = func(*args, **kwargs)
+        except CancelledError:
+            future._set_cancelled(future.token)
+        except BaseException as e:
+            # SystemExit and KeyboardInterrupt too; the caller sees them
+            # through the Future instead of the task hanging
+            logging.debug("Task {} failed: {!r}".format(func, e))
+            future._set_exception(e)
+        else:
+            future._set_result(result)
+        finally:
+            _task_context.future = None
+            if future.token is not None:
+                future.token._detach()
+        return
+
+
+_DEFAULT_POOL = []
+_DEFAULT_POOL_LOCK = threading.Lock()
+
+
+def _default_pool():
+    """Returns the WorkerPool shared by thread_tasks."""
+    with _DEFAULT_POOL_LOCK:
+        if not _DEFAULT_POOL:
+            _DEFAULT_POOL.append(WorkerPool(DEFAULT_WORKERS, "Task"))
+    return _DEFAULT_POOL[0]
+
+
+def _submit(widget, func, *args):
+    """Submits a task to the pool of the app that owns widget, or to the
+    shared pool (created on first use) outside of an App."""
+    submit = getattr(widget._root(), "submit", None)
+    if submit is None:
+        submit = _default_pool().submit
+    return submit(func, *args)
+
+
+def wait_all(futures, timeout=None):
+    """Waits until all futures are done. Returns False on timeout."""
+    deadline = None if timeout is None else _clock() + timeout
+    for future in futures:
+        remaining = None if deadline is None else max(0, deadline - _clock())
+        if not future._done.wait(remaining):
+            return False
+    return True
+
+
+# Set in child processes of a ProcessPool
+_PROGRESS_QUEUE = None
+_CURRENT_TASK = None
+
+
+def _process_init(progress_queue):
+    """ProcessPool initializer; runs once in each child process."""
+    global _PROGRESS_QUEUE
+    _PROGRESS_QUEUE = progress_queue
+
+
+def _process_run(task_id, module, name, payload):
+    """Runs a module-level function in a child process.
+    Returns ("ok", pickled result) or ("error", exception): Python 2 pools
+    cannot report errors to a callback, so every failure, including a result
+    that cannot be pickled, comes back as data.
+    """
+    global _CURRENT_TASK
+    _CURRENT_TASK = task_id
+    try:
+        func = getattr(importlib.import_module(module), name)
+        # Unwrap functions decorated with App.cpu_process
+        func = getattr(func, "_process_func", func)
+        args, kwargs = pickle.loads(payload)
+        return ("ok", pickle.dumps(func(*args, **kwargs), -1))
+    except BaseException as e:
+        logging.exception("Process {} failed".format(name))
+        try:
+            pickle.dumps(e, -1)
+        except Exception:
+            e = RuntimeError(repr(e))
+        return ("error", e)
+    finally:
+        _CURRENT_TASK = None
+
+
+def report_progress(done, total=None, message=""):
+    """Reports progress from a function running in a ProcessPool.
+    Does nothing when called outside of a child process.
+    """
+    if _PROGRESS_QUEUE is not None:
+        _PROGRESS_QUEUE.put((_CURRENT_TASK, done, total, message))
     return
 
 
+class ProcessPool(object):
+    """Runs CPU-bound, module-level functions in a pool of child processes.
+
+    Results come back as Futures; progress reported by the function with
+    report_progress() is passed to a callback, on the UI thread if a
+    dispatcher is given. Progress messages that arrive faster than the UI
+    drains them are merged (only the latest one per task is delivered).
+    """
+    def __init__(self, processes=None, dispatcher=None):
+        """
+        Args:
+            processes (int): number of child processes (default: CPU count)
+            dispatcher (Dispatcher): delivers callbacks on the UI thread
+        """
+        self.processes = processes
+        self.dispatcher = dispatcher
+        self._pool = None
+        self._progress = None
+        self._listener = None
+        self._handlers = {}
+        self._latest = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _start(self):
+        self._progress = multiprocessing.Queue()
+        self._pool = multiprocessing.Pool(self.processes, _process_init,
+                                          (self._progress,))
+        self._listener = threading.Thread(target=self._listen,
+                                          name="ProcessPool-progress")
+        self._listener.daemon = True
+        self._listener.start()
+        return
+
+    def submit(self, func, args=(), kwargs=None, progress=None):
+        """Runs func(*args, **kwargs) in a child process.
+        Args:
+            func (function): a function defined at module level
+            args (tuple): positional arguments; must be picklable
+            kwargs (dict): keyword arguments; must be picklable
+            progress (function): called with (done, total, message)
+        Returns a Future. Raises ValueError for bound methods, nested
+        functions and arguments that cannot be pickled.
+        """
+        if getattr(func, "__self__", None) is not None:
+            raise ValueError(
+                "{!r} is a bound method; only functions defined at module "
+                "level can run in a process".format(func))
+        module, name = func.__module__, func.__name__
+        found = getattr(sys.modules.get(module), name, None)
+        if getattr(found, "_process_func", found) is not func:
+            raise ValueError(
+                "{} must be defined at module level to run in a "
+                "process".format(name))
+        try:
+            payload = pickle.dumps((tuple(args), kwargs or {}), -1)
+        except Exception as e:
+            raise ValueError("The arguments of {} cannot be sent to a "
+                             "process: {!r}".format(name, e))
+        if self._pool is None:
+            self._start()
+        task_id = next(self._ids)
+        if progress is not None:
+            self._handlers[task_id] = progress
+        future = Future(self.dispatcher)
+        future._set_running()
+        start = _clock()
+
+        def finished(outcome):
+            self._handlers.pop(task_id, None)
+            if tracing.enabled:
+                tracing.complete(name, "process", start, _clock() - start)
+            status, value = outcome
+            if status != "ok":
+                future._set_exception(value)
+                return
+            try:
+                future._set_result(pickle.loads(value))
+            except Exception as e:
+                future._set_exception(e)
+            return
+
+        options = {"callback": finished}
+        if sys.version_info[0] >= 3:
+            # e.g. a child process that died; Python 2 has no error_callback
+            options["error_callback"] = lambda e: finished(("error", e))
+        self._pool.apply_async(_process_run, (task_id, module, name, payload),
+                               **options)
+        return future
+
+    def shutdown(self, wait=True):
+        """Stops the child processes; running tasks are lost if not wait."""
+        if self._pool is None:
+            return
+        if wait:
+            self._pool.close()
+        else:
+            self._pool.terminate()
+        self._pool.join()
+        self._progress.put(None)
+        self._pool = None
+        return
+
+    def _listen(self):
+        """Forwards progress messages from the children to the handlers."""
+        while True:
+            item = self._progress.get()
+            if item is None:
+                return
+            task_id = item[0]
+            if task_id not in self._handlers:
+                continue
+            if self.dispatcher is None:
+                self._deliver(task_id, item)
+                continue
+            with self._lock:
+                pending = task_id in self._latest
+                self._latest[task_id] = item
+            if not pending:
+                self.dispatcher.submit(self._deliver, task_id)
+
+    def _deliver(self, task_id, item=None):
+        if item is None:
+            with self._lock:
+                item = self._latest.pop(task_id)
+        handler = self._handlers.get(task_id)
+        if handler is not None:
+            handler(*item[1:])
+        return
+
+
 class ThreadedClient(threading.Thread):
-    def __init__(self, name, process):
-        """Subclass of thread allows for easier thread creation."""
+    def __init__(self, name, process, token=None, timeout=None):
+        """Subclass of thread allows for easier thread creation.
+        Args:
+            token (CancelToken): parent token; cancelling it stops the thread
+            timeout (float): seconds, from now, the thread may run
+        The process gets the thread's token from current_token() and should
+        check it; .cancel() cancels it.
+        """
         threading.Thread.__init__(self)
         self.name = name
         self.process = process
+        self.token = CancelToken(timeout, parent=token)
+
+    def cancel(self):
+        """Asks the process to stop."""
+        self.token.cancel()
+        return
 
     def run(self):
         """Runs at thread start."""
         logging.debug("{0} thread started".format(self.name))
-        self.process()
+        _task_context.token = self.token
+        try:
+            with tracing.span(self.name, "thread"):
+                self.process()
+        except CancelledError:
+            logging.debug("{0} thread cancelled".format(self.name))
+        finally:
+            _task_context.token = None
+            self.token._detach()
         logging.debug("{0} thread terminated".format(self.name))
 
 
+# ==============================================================================
+# ASYNCIO
+
+
+# inspect.CO_COROUTINE; checked directly so asyncio is only imported if used
+_CO_COROUTINE = 0x80 if sys.version_info >= (3, 5) else 0
+
+
+def _is_coroutine_function(func):
+    """Returns True if func is an `async def` function (or method), or a
+    wrapper of one marked with `_coroutine_function` (e.g. by
+    consolemsgs.status_process)."""
+    func = getattr(func, "__func__", func)
+    if getattr(func, "_coroutine_function", False):
+        return True
+    code = getattr(func, "__code__", None)
+    return code is not None and bool(code.co_flags & _CO_COROUTINE)
+
+
+class AsyncLoop(object):
+    """Runs an asyncio event loop in slices from the Tk main loop.
+
+    No thread is used: each slice runs the ready callbacks and polls I/O
+    without blocking, then hands control back to Tk. Slices are scheduled
+    quickly while coroutines have work ready, slower while they wait, and not
+    at all once every coroutine has finished.
+    """
+    def __init__(self, root, busy_interval=1, idle_interval=20):
+        """
+        Args:
+            root: the Tk root whose main loop drives the event loop
+            busy_interval (int): ms between slices while callbacks are ready
+            idle_interval (int): maximum ms between slices while waiting
+        """
+        self.root = root
+        self.busy_interval = busy_interval
+        self.idle_interval = idle_interval
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._tasks = set()
+        self._after_id = None
+
+    def run(self, coro):
+        """Schedules a coroutine; must be called from the UI thread.
+        Returns an asyncio.Task.
+        """
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        self._schedule(0)
+        return task
+
+    def close(self):
+        """Cancels all running coroutines and closes the event loop."""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._tasks:
+            for task in self._tasks:
+                task.cancel()
+            self.loop.run_until_complete(
+                asyncio.gather(*self._tasks, return_exceptions=True))
+        self.loop.close()
+        return
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error("Coroutine failed", exc_info=(
+                type(task.exception()), task.exception(),
+                task.exception().__traceback__))
+        return
+
+    def _schedule(self, delay):
+        if self._after_id is None:
+            self._after_id = self.root.after(delay, self._step)
+        return
+
+    def _step(self):
+        """Runs one slice of the event loop."""
+        self._after_id = None
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+        if not self._tasks:
+            return
+        if getattr(self.loop, "_ready", None):
+            self._schedule(self.busy_interval)
+            return
+        delay = self.idle_interval
+        scheduled = getattr(self.loop, "_scheduled", None)
+        if scheduled:
+            until = int((scheduled[0].when() - self.loop.time()) * 1000)
+            delay = max(self.busy_interval, min(delay, until))
+        self._schedule(delay)
+        return
+
+
+# ==============================================================================
+# WATCHDOG
+
+
+def _callback_name(func):
+    """Returns a readable name for a Tk callback."""
+    name = getattr(func, "_command_name", None)
+    if name:
+        return name
+    owner = getattr(func, "__self__", None)
+    name = getattr(func, "__name__", None) or repr(func)
+    if owner is not None:
+        name = "{}.{}".format(type(owner).__name__, name)
+    return name
+
+
+def _running_callback(frame):
+    """Returns the name of the Tk callback (command, binding or after())
+    that a stack of the main thread is in, or None. In nested event loops
+    (e.g. update() inside a command) the innermost callback is returned."""
+    while frame is not None:
+        if frame.f_code is tk.CallWrapper.__call__.__code__:
+            func = frame.f_locals.get("self").func
+            # after() wraps its function in a local "callit"
+            is_after = getattr(func, "__name__", None) == "callit"
+            inner = (getattr(func, "__closure__", None) or ()) if is_after \
+                else ()
+            for cell in inner:
+                if callable(cell.cell_contents):
+                    func = cell.cell_contents
+                    break
+            # The stack is walked from the top, so this is the innermost
+            return _callback_name(func)
+        frame = frame.f_back
+    return None
+
+
+class Watchdog(object):
+    """Measures how late the Tk main loop runs after() heartbeats.
+
+    A heartbeat is scheduled every `interval` ms; its lag is how long the
+    loop was busy elsewhere. A sampler thread checks the heartbeat and, when
+    it is more than `threshold` ms late, takes a stack sample of the main
+    thread and names the command, binding or after() callback that was
+    running. The stall is logged and passed to `on_stall` (on the main
+    thread) once the loop recovers.
+    """
+    def __init__(self, root, interval=50, threshold=200, history=1000,
+                 on_stall=None):
+        """
+        Args:
+            root: the Tk root to watch
+            interval (int): ms between heartbeats
+            threshold (int): ms of lag counted as a stall
+            history (int): number of heartbeats kept for percentiles
+            on_stall (function): called with each stall dict
+        """
+        self.root = root
+        self.interval = interval
+        self.threshold = threshold
+        self.on_stall = on_stall
+        self.lags = deque(maxlen=history)
+        self.stalls = deque(maxlen=50)
+        self._main_ident = threading.current_thread().ident
+        self._expected = None
+        self._sample = None
+        self._after_id = None
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        """Starts the heartbeat and the sampler thread."""
+        if self._after_id is not None:
+            return self
+        self._stop.clear()
+        self._expected = _clock() + self.interval / 1000.0
+        self._after_id = self.root.after(self.interval, self._beat)
+        self._sampler = threading.Thread(target=self._watch,
+                                         name="Watchdog")
+        self._sampler.daemon = True
+        self._sampler.start()
+        return self
+
+    def stop(self):
+        """Stops watching."""
+        self._stop.set()
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        return
+
+    def _beat(self):
+        now = _clock()
+        lag = max(0.0, now - self._expected) * 1000
+        self.lags.append(lag)
+        sample, self._sample = self._sample, None
+        if sample is not None or lag >= self.threshold:
+            stall = sample or {"command": None, "stack": []}
+            stall["duration"] = lag
+            self.stalls.append(stall)
+            logging.warning("UI loop stalled for {:.0f} ms in {}".format(
+                lag, stall["command"] or "an unknown callback"))
+            if self.on_stall is not None:
+                # A failing handler must not stop the heartbeat
+                try:
+                    self.on_stall(stall)
+                except Exception:
+                    logging.exception("Watchdog on_stall handler failed")
+        self._expected = _clock() + self.interval / 1000.0
+        self._after_id = self.root.after(self.interval, self._beat)
+        return
+
+    def _watch(self):
+        """Sampler thread; samples each stall once."""
+        threshold = self.threshold / 1000.0
+        expected = None
+        while not self._stop.wait(threshold / 4):
+            late = _clock() - self._expected
+            if late < threshold or expected == self._expected:
+                continue
+            expected = self._expected
+            frame = sys._current_frames().get(self._main_ident)
+            if frame is None:
+                continue
+            self._sample = {
+                "command": _running_callback(frame),
+                "stack": traceback.format_stack(frame)}
+            del frame
+        return
+
+    def percentile(self, percent):
+        """Returns the heartbeat lag (ms) at a percentile of the history."""
+        lags = sorted(self.lags)
+        if not lags:
+            return 0.0
+        index = min(len(lags) - 1, int(round(percent / 100.0 * len(lags))))
+        return lags[index]
+
+    @property
+    def stats(self):
+        """Loop latency summary in ms."""
+        return {"beats": len(self.lags),
+                "p50": self.percentile(50),
+                "p99": self.percentile(99),
+                "max": max(self.lags) if self.lags else 0.0,
+                "stalls": len(self.stalls)}
+
+
+# ==============================================================================
+# FORMS
+
+
+def _trace_write(variable, callback):
+    """Calls callback() whenever a Tk variable is written.
+    Returns the trace name for _trace_remove."""
+    if hasattr(variable, "trace_add"):
+        return variable.trace_add("write", lambda *args: callback())
+    return variable.trace("w", lambda *args: callback())
+
+
+def _trace_remove(variable, trace):
+    """Removes a trace added by _trace_write."""
+    if hasattr(variable, "trace_remove"):
+        variable.trace_remove("write", trace)
+    else:
+        variable.trace_vdelete("w", trace)
+    return
+
+
+def _input_variable(widget):
+    """Returns the Tk variable that holds a widget's input, if any."""
+    for attr in ("fileVar", "radio_value", "variable"):
+        variable = getattr(widget, attr, None)
+        if isinstance(variable, tk.Variable):
+            return variable
+    return None
+
+
+class _WidgetRegistry(dict):
+    """The dict of an app's widgets by name; reports each widget stored
+    or removed, so the form is bound as widgets are registered."""
+    def __init__(self, changed, widgets=()):
+        """
+        Args:
+            changed (function): called with (name, widget) when a widget is
+                stored and with (name, None) when one is removed
+            widgets (dict): initial widgets
+        """
+        dict.__init__(self)
+        self._changed = changed
+        for name, widget in dict(widgets).items():
+            self[name] = widget
+
+    def __setitem__(self, name, widget):
+        if self.get(name) is widget:
+            return
+        dict.__setitem__(self, name, widget)
+        self._changed(name, widget)
+        return
+
+    def __delitem__(self, name):
+        dict.__delitem__(self, name)
+        self._changed(name, None)
+        return
+
+    def pop(self, name, *default):
+        if name not in self:
+            return dict.pop(self, name, *default)
+        widget = dict.pop(self, name)
+        self._changed(name, None)
+        return widget
+
+
+class FormModel(object):
+    """Observable model of an app's input values.
+
+    Fields bound with a Tk variable are marked dirty when the variable
+    changes, and snapshot() only reads dirty fields. Fields without a
+    variable cannot be observed and are read on every snapshot. Subscribers
+    are called with the changed fields only.
+    """
+    def __init__(self, values=None):
+        """
+        Args:
+            values (dict): dict that holds the current values
+        """
+        self.values = {} if values is None else values
+        self._getters = {}
+        # name -> (variable, trace name) of observed fields
+        self._traces = {}
+        self._dirty = set()
+        self._unobserved = set()
+        self._subscribers = []
+
+    def __len__(self):
+        return len(self._getters)
+
+    def __contains__(self, name):
+        return name in self._getters
+
+    def bind(self, name, getter, variable=None):
+        """Adds a field.
+        Args:
+            name (str): field name
+            getter (function): returns the field's current value
+            variable (tk.Variable): variable whose changes mark the field
+                dirty; without one the field is read on every snapshot
+        """
+        if name in self._getters:
+            self.unbind(name)
+        self._getters[name] = getter
+        self._dirty.add(name)
+        if variable is None:
+            self._unobserved.add(name)
+        else:
+            self._traces[name] = (variable, _trace_write(
+                variable, lambda: self.mark_dirty(name)))
+        return
+
+    def unbind(self, name):
+        """Removes a field and stops observing its variable."""
+        if name in self._traces:
+            variable, trace = self._traces.pop(name)
+            try:
+                _trace_remove(variable, trace)
+            except tk.TclError:
+                # The variable was already deleted with its widget
+                pass
+        self._getters.pop(name, None)
+        self._dirty.discard(name)
+        self._unobserved.discard(name)
+        self.values.pop(name, None)
+        return
+
+    def mark_dirty(self, name):
+        """Marks a field as changed."""
+        if name in self._getters:
+            self._dirty.add(name)
+        return
+
+    def subscribe(self, func):
+        """Calls func(changes) with a dict of changed fields per snapshot."""
+        self._subscribers.append(func)
+        return
+
+    def snapshot(self):
+        """Reads dirty (and unobserved) fields into values.
+        Returns a dict of the fields whose value changed."""
+        names = self._dirty | self._unobserved
+        self._dirty = set()
+        changes = {}
+        for name in names:
+            try:
+                value = self._getters[name]()
+            except (AttributeError, tk.TclError, ValueError):
+                continue
+            if name not in self.values or self.values[name] != value:
+                self.values[name] = value
+                changes[name] = value
+        if changes:
+            for func in self._subscribers:
+                func(changes)
+        return changes
+
+
+# ==============================================================================
+# VALIDATION
+
+
+def cached_validator(func=None, maxsize=256, ttl=30):
+    """Decorator; caches the results of an expensive validator by value.
+    Args:
+        maxsize (int): number of values to remember
+        ttl (float): seconds a result stays valid (None: forever); file
+            system checks should not be trusted forever
+    """
+    if func is None:
+        return lambda f: cached_validator(f, maxsize, ttl)
+    cache = OrderedDict()
+    lock = threading.Lock()
+
+    def wrapper(value):
+        now = _clock()
+        with lock:
+            if value in cache:
+                checked, result = cache.pop(value)
+                if ttl is None or now - checked < ttl:
+                    cache[value] = (checked, result)
+                    return result
+        result = func(value)
+        with lock:
+            cache[value] = (now, result)
+            while len(cache) > maxsize:
+                cache.popitem(last=False)
+        return result
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+# Validators return None if a value is valid or an error message otherwise
+
+@cached_validator
+def path_exists(path):
+    """Checks that a path exists."""
+    if not os.path.exists(path):
+        return "Path does not exist"
+
+
+@cached_validator
+def path_readable(path):
+    """Checks that a path exists and can be read."""
+    if not os.path.exists(path):
+        return "Path does not exist"
+    if not os.access(path, os.R_OK):
+        return "Path is not readable"
+
+
+@cached_validator
+def is_file(path):
+    """Checks that a path is an existing file."""
+    if not os.path.isfile(path):
+        return "Not a file"
+
+
+@cached_validator
+def is_directory(path):
+    """Checks that a path is an existing directory."""
+    if not os.path.isdir(path):
+        return "Not a directory"
+
+
+class Validation(object):
+    """Validates a Tk variable in the background as the user types.
+
+    Validation starts once the value has not changed for `delay` ms and runs
+    on a worker, so slow checks (e.g. on network drives) never block the
+    window. Results of stale values are discarded and the latest message is
+    shown in a label below the input.
+    """
+    def __init__(self, widget, variable, parent, delay=300):
+        """
+        Args:
+            widget: widget used for scheduling and to find the app
+            variable (tk.Variable): the value to validate
+            parent: container the message label is placed in
+            delay (int): ms to wait after the last change
+        """
+        self.widget = widget
+        self.variable = variable
+        self.delay = delay
+        self.validators = []
+        self.message = None
+        self.valid = None
+        self.label = ttk.Label(parent, text="", foreground="red")
+        self._after_id = None
+        self._generation = 0
+        self._future = None
+        _trace_write(variable, self._changed)
+
+    def add(self, *validators):
+        """Adds validators; each returns None or an error message."""
+        self.validators.extend(validators)
+        self._changed()
+        return
+
+    def check(self, value):
+        """Runs the validators; returns the first error message or None."""
+        for validator in self.validators:
+            try:
+                message = validator(value)
+            except Exception as e:
+                message = str(e) or type(e).__name__
+            if message:
+                return message
+        return None
+
+    def _changed(self):
+        """Restarts the debounce timer; called on each change."""
+        self._generation += 1
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+        self._after_id = self.widget.after(self.delay, self._run)
+        return
+
+    def _run(self):
+        self._after_id = None
+        if self._future is not None:
+            # Drop a stale check that has not started yet
+            self._future.cancel()
+        generation = self._generation
+        value = self.variable.get()
+        if not value:
+            self._show(generation, None)
+            return
+        self._future = _submit(self.widget, self.check, value)
+        _when_done(self.widget, self._future,
+                   lambda future: self._done(generation, future))
+        return
+
+    def _done(self, generation, future):
+        if not future.cancelled():
+            self._show(generation, future.result())
+        return
+
+    def _show(self, generation, message):
+        """Shows the result of the latest value only."""
+        if generation != self._generation:
+            return
+        self._future = None
+        self.message = message
+        self.valid = message is None
+        if message:
+            self.label.config(text=message)
+            siblings = self.label.master.pack_slaves()
+            if self.label not in siblings:
+                self.label.pack(side="bottom", anchor="w", padx=5,
+                                before=siblings[0] if siblings else None)
+        else:
+            self.label.pack_forget()
+        return
+
+
+class _ValidatedInput(object):
+    """Mixin adding background validation to an input widget.
+
+    Widgets using it define _validation_widgets(), returning the entry, the
+    Tk variable to validate and the container the message is shown in.
+    """
+    # Created by add_validator
+    validation = None
+
+    def add_validator(self, *validators, **options):
+        """Validates the input in the background as the user types.
+        Validators (e.g. path_exists) return None or an error message.
+        Args:
+            delay (int): ms to wait after the last keystroke (default 300)
+        """
+        if self.validation is None:
+            entry, variable, parent = self._validation_widgets()
+            self.validation = Validation(entry, variable, parent, **options)
+        self.validation.add(*validators)
+        return
+
+
 # ==============================================================================
 # APP WINDOWS
 
@@ -123,6 +1665,15 @@ class BaseApp(tk.Tk):
         self.input_values = {}
         # Custom closing procedure
         self.on_close = NULL_ACTION
+        # Queue of UI updates submitted by worker threads
+        self.dispatcher = Dispatcher(self)
+        self.dispatcher.start()
+        # Worker and process pools; created by subclasses on first use
+        self._executor = None
+        self._process_pool = None
+        # asyncio loop; created on first use
+        self._async_loop = None
+        self._watchdog = None
 
     def _startup(self):
         """Handle window startup procedures."""
@@ -142,8 +1693,51 @@ class BaseApp(tk.Tk):
         self.widgets[_clean_name(name)] = widget
         return
 
+    def dispatch(self, func, *args, **kwargs):
+        """Thread-safe; runs func(*args, **kwargs) on the UI thread."""
+        self.dispatcher.submit(func, *args, **kwargs)
+        return
+
+    def run_async(self, coro):
+        """Runs a coroutine on the app's asyncio loop, which shares time with
+        mainloop(). Returns an asyncio.Task (None if called from a worker
+        thread, in which case the coroutine is scheduled by the dispatcher).
+        """
+        if not self.dispatcher.in_main_thread():
+            self.dispatcher.submit(self.run_async, coro)
+            return
+        if self._async_loop is None:
+            self._async_loop = AsyncLoop(self)
+        return self._async_loop.run(coro)
+
+    def watch(self, threshold=200, **options):
+        """Starts a Watchdog that reports main loop stalls over threshold
+        ms; see Watchdog for the options. Returns the Watchdog."""
+        if self._watchdog is None:
+            self._watchdog = Watchdog(self, threshold=threshold, **options)
+        return self._watchdog.start()
+
+    def dispatch_config(self, widget, **options):
+        """Thread-safe; applies widget.config(**options) on the UI thread."""
+        self.dispatcher.configure(widget, **options)
+        return
+
+    def _release(self):
+        """Stops background dispatching and workers before closing."""
+        self.dispatcher.stop()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_pending=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False)
+        if self._async_loop is not None:
+            self._async_loop.close()
+        if self._watchdog is not None:
+            self._watchdog.stop()
+        return
+
     def close(self):
         """Handle the closing of the window."""
+        self._release()
         # Close the window
         self.destroy()
         # End the process
@@ -159,13 +1753,84 @@ class BaseApp(tk.Tk):
 
 class App(BaseApp):
     """App Window."""
-    def __init__(self, title="", width=400, height=200):
+    def __init__(self, title="", width=400, height=200,
+                 workers=DEFAULT_WORKERS, processes=None):
         BaseApp.__init__(self, title, width, height)
         self._startup()
+        self.workers = workers
+        self.processes = processes
+        # Input values; updated incrementally by cmd_collect_values
+        self.form = FormModel(self.input_values)
+        # Widgets are bound to the form as they are added or replaced
+        self.widgets = _WidgetRegistry(self._bind_widget, self.widgets)
+
+    @property
+    def executor(self):
+        """The app's WorkerPool; started on first use."""
+        if self._executor is None:
+            self._executor = WorkerPool(self.workers, self.title() or "App",
+                                        self.dispatcher)
+        return self._executor
+
+    def submit(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) on the app's worker pool.
+        Returns a Future; its done-callbacks are called on the UI thread.
+        """
+        return self.executor.submit(func, *args, **kwargs)
+
+    def submit_task(self, func, args=(), kwargs=None, **options):
+        """Like submit, with the cancellation options of
+        WorkerPool.submit_task (token, timeout, deadline)."""
+        return self.executor.submit_task(func, args, kwargs, **options)
+
+    @property
+    def process_pool(self):
+        """The app's ProcessPool; started on first use."""
+        if self._process_pool is None:
+            self._process_pool = ProcessPool(self.processes, self.dispatcher)
+        return self._process_pool
+
+    def cpu_process(self, func=None, callback=None, progress=None):
+        """Wrapper/decorator for CPU-bound app processes.
+        The process runs in a child process and is called with the values
+        collected by cmd_collect_values as its first argument. It must be
+        defined at module level; decorate it inside the script's
+        `if __name__ == "__main__":` block so child processes do not build
+        the app again. Call the returned wrapper directly; it cannot be
+        bound with add_command.
+        Args:
+            func (function): the process
+            callback (function): called with the Future on the UI thread
+            progress (function): called with (done, total, message) on the UI
+                thread whenever the process calls report_progress()
+        """
+        if func is None:
+            return lambda f: self.cpu_process(f, callback, progress)
+
+        def wrapper(*args, **kwargs):
+            self.cmd_collect_values()
+            future = self.process_pool.submit(
+                func, (dict(self.input_values),) + args, kwargs, progress)
+            spinner = getattr(self, "spinner", None)
+            if spinner is not None:
+                future.add_done_callback(spinner.stop)
+            if callback is not None:
+                future.add_done_callback(callback)
+            if spinner is not None:
+                spinner.run()
+            return future
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper._process_func = func
+        return wrapper
 
     def add_button(self, label, action, **kwargs):
-        """Adds a button."""
-        button = ttk.Button(self, text=label, command=action)
+        """Adds a button. The action may be an `async def` function."""
+        if _is_coroutine_function(action):
+            coro_func = action
+            action = lambda: self.run_async(coro_func())
+        button = ttk.Button(self, text=label,
+                            command=_traced_command(label, action))
         button.pack(kwargs)
         name = _clean_name(label)
         self.widgets[name + "_button"] = button
@@ -175,20 +1840,29 @@ class App(BaseApp):
         """Adds a text box and label."""
         ttk.Label(text="{} ".format(label)).pack(padx=10, pady=0)
         text_box = ttk.Entry(self, width=length)
+        text_box.variable = tk.StringVar(self)
+        text_box.config(textvariable=text_box.variable)
         text_box.pack(padx=10, pady=10)
         name = _clean_name(label)
         self.widgets[name + "_textbox"] = text_box
         return
 
+    def _bind_widget(self, name, widget):
+        """Binds a widget stored under name to the form (None unbinds)."""
+        if widget is not None and hasattr(widget, "get"):
+            self.form.bind(name, widget.get, _input_variable(widget))
+        else:
+            self.form.unbind(name)
+        return
+
     def cmd_collect_values(self):
-        """Executes all widgets' .get() method to collect user input values."""
-        for name, widget in self.widgets.items():
-            try:
-                input_val = widget.get()
-                print(input_val)
-                self.input_values[name] = input_val
-            except (AttributeError, tk.TclError):
-                pass
+        """Collects the values of input widgets into input_values.
+        Only widgets that changed since the last call are read.
+        Returns a dict of the changed values."""
+        changes = self.form.snapshot()
+        for name, value in changes.items():
+            logging.debug("{}: {}".format(name, value))
+        return changes
 
     def cmd_collect_quit(self):
         """Combines the collect values and close command."""
@@ -197,7 +1871,17 @@ class App(BaseApp):
         return
 
     def add_command(self, name, func):
-        """Add a function as a window method; can be called by widgets."""
+        """Add a function as a window method; can be called by widgets.
+        Coroutine functions are run on the app's asyncio loop when called.
+        """
+        if hasattr(func, "_process_func"):
+            raise ValueError(
+                "{} runs in a child process and cannot be bound to the app; "
+                "call the cpu_process wrapper directly".format(name))
+        if _is_coroutine_function(func):
+            setattr(self, name,
+                    lambda *args: self.run_async(func(self, *args)))
+            return
         setattr(self, name, MethodType(func, self))
         return
 
@@ -218,6 +1902,7 @@ class ThreadedApp(threading.Thread, App):
 
     def close(self):
         """Handle the closing of the window."""
+        self._release()
         self.destroy()
         self.quit()
         #self.on_close()
@@ -231,7 +1916,8 @@ class ThreadedApp(threading.Thread, App):
         """Threaded process called by .start() via mainloop()."""
         self.protocol("WM_DELETE_WINDOW", self.close)
         logging.debug("{} thread started".format(self.name))
-        self.main()
+        with tracing.span(self.name, "thread"):
+            self.main()
         logging.debug("{} thread complete".format(self.name))
 
     def mainloop_and_run(self):
@@ -248,51 +1934,76 @@ class ThreadedApp(threading.Thread, App):
         return wrapper
 
 
-class Popup(BaseApp):
+@contextmanager
+def _dialog_parent(parent=None):
+    """Yields the window dialogs are parented to: the given parent, else the
+    running app's root. Without either, a hidden temporary root is created
+    and destroyed once the dialog is dismissed."""
+    if parent is None:
+        parent = getattr(tk, "_default_root", None)
+    if parent is not None:
+        yield parent
+        return
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        yield root
+    finally:
+        root.destroy()
+
+
+class Popup(object):
     """Wrapper object for tkMessageBox."""
-    def __init__(self, title="", message=""):
-        """A popup window that is displayed using .show_ methods."""
-        BaseApp.__init__(self, title)
-        # Hide the root window
-        self.withdraw()
+    def __init__(self, title="", message="", parent=None):
+        """A popup window that is displayed using .show_ methods.
+        Nothing is created until a popup is shown; it then reuses the
+        running app's interpreter.
+        Args:
+            title (str): window title
+            message (str): text to display
+            parent: window to show the popup over (default: the app)
+        """
         self.name = title
         self.message = message
+        self.parent = parent
         self.input = ""
 
+    def _show(self, dialog, **options):
+        """Shows a tkMessageBox dialog and stores its result as input."""
+        with _dialog_parent(self.parent) as parent:
+            self.input = dialog(self.name, self.message, parent=parent,
+                                **options)
+        return self.input
+
     def show_ok_cancel(self):
         """Display a popup with 'OK' and 'Cancel'. Returns True or False."""
-        self.input = tkMessageBox.askokcancel(self.name, self.message)
-        return
+        return self._show(tkMessageBox.askokcancel)
 
     def show_yes_no(self, cancel=False):
         """Display a popup with 'Yes', 'No', and optionally 'Cancel'.
         Returns True, False, or None."""
         if cancel:
-            self.input = tkMessageBox.askyesnocancel(self.name, self.message)
-            return
-        self.input = tkMessageBox.askyesno(self.name, self.message)
-        return
+            return self._show(tkMessageBox.askyesnocancel)
+        return self._show(tkMessageBox.askyesno)
 
     def show_info(self):
         """Display an info popup with 'OK' button. Returns 'ok'."""
-        self.input = tkMessageBox.showinfo(self.name, self.message)
-        return
+        return self._show(tkMessageBox.showinfo)
 
     def show_warn(self):
         """Display a warning popup with 'OK' button. Returns 'ok'."""
-        self.input = tkMessageBox.showwarning(self.name, self.message)
-        return
+        return self._show(tkMessageBox.showwarning)
 
     def show_error(self):
         """Display an error popup with 'OK' button. Returns 'ok'."""
-        self.input = tkMessageBox.showerror(self.name, self.message)
-        return
+        return self._show(tkMessageBox.showerror)
 
     def file_dialog(self, extensions=["*.*"], filetypes=["All files"]):
         """Opens file browser and returns selection as input."""
         options = dict(defaultextension=extensions[0],
-                       filetypes=zip(filetypes, extensions))
-        result = tkFileDialog.askopenfilenames(parent=self, **options)
+                       filetypes=list(zip(filetypes, extensions)))
+        with _dialog_parent(self.parent) as parent:
+            result = tkFileDialog.askopenfilenames(parent=parent, **options)
         self.input = result
         return result
 
@@ -352,8 +2063,12 @@ class Menu(tk.Menu):
         # Handle new apps as actions
         if hasattr(action, "mainloop"):
             action = action.mainloop
+        # Run coroutine functions on the app's asyncio loop
+        if _is_coroutine_function(action):
+            coro_func = action
+            action = lambda: self._root().run_async(coro_func())
         self.items.update({name: action})
-        self.add_command(label=name, command=action)
+        self.add_command(label=name, command=_traced_command(name, action))
         return
 
     def add_submenu(self, name, underline=0):
@@ -364,19 +2079,121 @@ class Menu(tk.Menu):
         return
 
 
-# =============================================================================
-# ENTRYBOX
+# =============================================================================
+# ENTRYBOX
+
+def _format_seconds(seconds):
+    """Formats a number of seconds as h:mm:ss or m:ss."""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return "{}:{:02d}:{:02d}".format(hours, minutes, seconds)
+    return "{}:{:02d}".format(minutes, seconds)
+
+
+class ProgressToken(object):
+    """Thread-safe done/total counter that a worker reports progress with.
+
+    Updating a token only changes its counters; the StatusBar that created it
+    reads them at a fixed frame rate, so tokens can be updated as often as
+    needed.
+    """
+    def __init__(self, total=None, label="", cancel_token=None):
+        """
+        Args:
+            total (int): number of steps; None if unknown
+            label (str): text shown in front of the progress
+            cancel_token (CancelToken): cancelled by the StatusBar's Cancel
+                button
+        """
+        self.total = total
+        self.label = label
+        self.cancel_token = cancel_token
+        self.done = 0
+        self.started = _clock()
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def update(self, n=1):
+        """Adds n completed steps."""
+        with self._lock:
+            self.done += n
+        return
+
+    def set(self, done, total=None):
+        """Sets the number of completed (and optionally total) steps."""
+        with self._lock:
+            self.done = done
+            if total is not None:
+                self.total = total
+        return
+
+    def finish(self):
+        """Marks the work as complete."""
+        self.finished = True
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.finish()
+
+    @property
+    def fraction(self):
+        """Completed fraction (0-1) or None if the total is unknown."""
+        if not self.total:
+            return None
+        return min(1.0, float(self.done) / self.total)
+
+    @property
+    def rate(self):
+        """Steps per second since the token was created."""
+        elapsed = _clock() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Estimated seconds remaining or None if unknown."""
+        rate = self.rate
+        if not self.total or not rate:
+            return None
+        return max(0, self.total - self.done) / rate
+
+    def format(self):
+        """Returns e.g. 'Label 42% 2,100/5,000 310/s ETA 0:09'."""
+        parts = [self.label] if self.label else []
+        fraction = self.fraction
+        if fraction is not None:
+            parts.append("{:.0%}".format(fraction))
+            parts.append("{:,}/{:,}".format(self.done, self.total))
+        else:
+            parts.append("{:,}".format(self.done))
+        parts.append("{:,.0f}/s".format(self.rate))
+        eta = self.eta
+        if eta is not None:
+            parts.append("ETA {}".format(_format_seconds(eta)))
+        return " ".join(parts)
+
 
 class StatusBar(ttk.Frame):
     def __init__(self, root, left="", left_alt="",
                  right="Ready.", right_alt="Working...",
-                 relief="sunken"):
-        """Frame at bottom of root with labels at left and right."""
+                 relief="sunken", fps=15):
+        """Frame at bottom of root with labels at left and right.
+        Args:
+            fps (int): maximum redraws per second while reporting progress
+        """
         self.root = root
         self.left = left
         self.left_alt = left_alt
         self.right = right
         self.right_alt = right_alt
+        self.fps = fps
+        self.redraws = 0
+        self._tokens = []
+        self._tokens_lock = threading.Lock()
+        self._after_id = None
         ttk.Frame.__init__(self, root, relief=relief)
         # Place frame into root (at bottom)
         self.pack(side='bottom', anchor='s', fill='x',
@@ -387,11 +2204,102 @@ class StatusBar(ttk.Frame):
         # Place right label
         self.right_label = ttk.Label(self, text=self.right)
         self.right_label.pack(side="right", anchor="sw", padx=2, pady=2)
+        # Determinate progress bar; only shown while reporting progress
+        self.progressbar = ttk.Progressbar(self, orient="horizontal",
+                                           length=120, mode="determinate",
+                                           maximum=1.0)
+        # Shown while a progress with a CancelToken is running
+        self.cancel_button = ttk.Button(self, text="Cancel",
+                                        command=self.cancel)
+        self._cancel_shown = False
+
+    def _set_labels(self, left, right):
+        """Sets the label texts; safe to call from worker threads."""
+        dispatcher = _dispatcher_for(self)
+        if dispatcher is not None and not dispatcher.in_main_thread():
+            dispatcher.configure(self.left_label, text=left)
+            dispatcher.configure(self.right_label, text=right)
+            return
+        self.left_label.config(text=left)
+        self.right_label.config(text=right)
+        self.root.update()
+        return
 
     def reset(self):
-        self.left_label.config(text=self.left)
-        self.right_label.config(text=self.right)
-        self.root.update()
+        self._set_labels(self.left, self.right)
+        return
+
+    def progress(self, total=None, label="", cancel_token=None):
+        """Returns a ProgressToken whose progress is shown in the status bar.
+        Safe to call from any thread; call .finish() (or use it as a context
+        manager) when the work is complete. If a CancelToken is given, a
+        Cancel button that cancels it is shown while the work runs.
+        """
+        token = ProgressToken(total, label, cancel_token)
+        with self._tokens_lock:
+            self._tokens.append(token)
+        _ui_call(self, self._start_progress)
+        return token
+
+    def _start_progress(self):
+        if self._after_id is None:
+            self.progressbar.pack(side="right", anchor="se", padx=2, pady=2)
+            self._render_progress()
+        return
+
+    def _render_progress(self):
+        """Redraws the progress of all tokens; runs at most fps per second."""
+        with self._tokens_lock:
+            self._tokens = [t for t in self._tokens if not t.finished]
+        if not self._tokens:
+            self._after_id = None
+            self.progressbar.pack_forget()
+            self._show_cancel(False)
+            self.right_label.config(text=self.right)
+            return
+        self._show_cancel(any(t.cancel_token is not None and
+                              not t.cancel_token.cancelled
+                              for t in self._tokens))
+        if len(self._tokens) == 1:
+            token = self._tokens[0]
+            text = token.format()
+            fraction = token.fraction
+        else:
+            text = "{} tasks".format(len(self._tokens))
+            totals = [t.total for t in self._tokens]
+            fraction = None
+            if all(totals):
+                fraction = (float(sum(t.done for t in self._tokens)) /
+                            sum(totals))
+        if text != self.right_label.cget("text"):
+            self.right_label.config(text=text)
+        if fraction is None:
+            self.progressbar.config(mode="indeterminate")
+            self.progressbar.step(0.05)
+        else:
+            self.progressbar.config(mode="determinate", value=fraction)
+        self.redraws += 1
+        self._after_id = self.after(int(1000 / self.fps),
+                                    self._render_progress)
+        return
+
+    def _show_cancel(self, show):
+        if show != self._cancel_shown:
+            self._cancel_shown = show
+            if show:
+                self.cancel_button.pack(side="right", anchor="se", padx=2,
+                                        pady=2)
+            else:
+                self.cancel_button.pack_forget()
+        return
+
+    def cancel(self):
+        """Cancels the CancelTokens of all running progresses."""
+        with self._tokens_lock:
+            tokens = [t.cancel_token for t in self._tokens
+                      if t.cancel_token is not None]
+        for token in tokens:
+            token.cancel()
         return
 
     def process(self, func):
@@ -401,9 +2309,7 @@ class StatusBar(ttk.Frame):
         return wrapper
 
     def __enter__(self):
-        self.left_label.config(text=self.left_alt)
-        self.right_label.config(text=self.right_alt)
-        self.root.update()
+        self._set_labels(self.left_alt, self.right_alt)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.reset()
@@ -412,7 +2318,7 @@ class StatusBar(ttk.Frame):
 # =============================================================================
 # ENTRYBOX
 
-class EntryBox(ttk.LabelFrame):
+class EntryBox(ttk.LabelFrame, _ValidatedInput):
     def __init__(self, root, label, button_label, button_action,  # TODO: size
                  default_text="", clear_text=True, relief="ridge"):
         """Entry and action button in LabelFrame.
@@ -436,7 +2342,8 @@ class EntryBox(ttk.LabelFrame):
         #self.set_command(self.cmd)
         self.button.pack(side="right", anchor="sw", padx=2, pady=4)
 
-        self.entry = ttk.Entry(self)
+        self.variable = tk.StringVar(self)
+        self.entry = ttk.Entry(self, textvariable=self.variable)
         self.entry.pack(side="left", anchor="s", fill="x", expand="yes",
                         padx=2, pady=4)
         self.entry.insert(0, default_text)
@@ -449,6 +2356,9 @@ class EntryBox(ttk.LabelFrame):
     def get_value(self):
         return self.entry.get()
 
+    def _validation_widgets(self):
+        return self.entry, self.variable, self
+
     # TODO: does this work well?
     def __call__(self):
         result = self.button_action(self.get_value())
@@ -644,7 +2554,7 @@ class Radiobox(ttk.LabelFrame):
 
     def _print_selected(self):
         """For Testing"""
-        print self.radio_value.get()
+        print(self.radio_value.get())
 
 
 '''
@@ -677,25 +2587,601 @@ if __name__ == '__main__':
 # =============================================================================
 # FILETREE
 
+class _PathIndex(object):
+    """Ordered set of paths with O(1) add and lookup and O(log n) removal
+    and positional access.
+
+    Removed paths leave a hole in the ordered list. While there are holes,
+    a Fenwick tree counting the live slots maps positions to slots, so
+    positional access never rebuilds the list; the tree is built on first
+    use. Holes are compacted only once they make up half of a large list,
+    so removal stays cheap however many paths are removed.
+    """
+    def __init__(self):
+        self._items = []
+        self._pos = {}
+        self._removed = 0
+        # Fenwick tree (1-based) of live slots; None until needed
+        self._tree = None
+
+    def __len__(self):
+        return len(self._pos)
+
+    def __contains__(self, path):
+        return path in self._pos
+
+    def __iter__(self):
+        return (p for p in self._items if p is not None)
+
+    def __getitem__(self, index):
+        if not self._removed:
+            return self._items[index]
+        live = len(self._pos)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(live)
+            if step != 1:
+                return list(self)[index]
+            if start >= stop:
+                return []
+            # Skip the holes after the first slot
+            items = self._items
+            slot = self._slot(start)
+            count = stop - start
+            found = []
+            while len(found) < count:
+                path = items[slot]
+                if path is not None:
+                    found.append(path)
+                slot += 1
+            return found
+        if index < 0:
+            index += live
+        if not 0 <= index < live:
+            raise IndexError("path index out of range")
+        return self._items[self._slot(index)]
+
+    def add(self, path):
+        """Adds a path; returns False if it is already indexed."""
+        if path in self._pos:
+            return False
+        self._pos[path] = len(self._items)
+        self._items.append(path)
+        if self._tree is not None:
+            self._tree_append()
+        return True
+
+    def extend(self, paths):
+        """Adds paths in order; returns the list of paths that were new."""
+        added = []
+        for path in paths:
+            if path not in self._pos:
+                self._pos[path] = len(self._items)
+                self._items.append(path)
+                if self._tree is not None:
+                    self._tree_append()
+                added.append(path)
+        return added
+
+    def remove(self, path):
+        """Removes a path; raises KeyError if it is not indexed."""
+        slot = self._pos.pop(path)
+        self._items[slot] = None
+        self._removed += 1
+        if self._removed > 1024 and self._removed * 2 > len(self._items):
+            self.compact()
+        elif self._tree is not None:
+            self._tree_add(slot + 1, -1)
+        return
+
+    def index(self, path):
+        """Returns the position of a path."""
+        slot = self._pos[path]
+        if not self._removed:
+            return slot
+        if self._tree is None:
+            self._build_tree()
+        return self._prefix(slot)
+
+    def compact(self):
+        """Closes the holes left by removed paths."""
+        if not self._removed:
+            return
+        self._items = [p for p in self._items if p is not None]
+        self._pos = dict((p, i) for i, p in enumerate(self._items))
+        self._removed = 0
+        self._tree = None
+        return
+
+    # Fenwick tree of live slots
+
+    def _build_tree(self):
+        """Builds the tree in O(n)."""
+        n = len(self._items)
+        tree = [0] * (n + 1)
+        for i, path in enumerate(self._items, 1):
+            if path is not None:
+                tree[i] += 1
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        return
+
+    def _tree_add(self, i, delta):
+        tree = self._tree
+        n = len(tree) - 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+        return
+
+    def _tree_append(self):
+        """Extends the tree with the (live) last slot."""
+        i = len(self._items)
+        self._tree.append(1 + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+        return
+
+    def _prefix(self, i):
+        """Number of live paths in the first i slots."""
+        tree = self._tree
+        total = 0
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def _slot(self, position):
+        """Returns the slot of the live path at a position."""
+        if self._tree is None:
+            self._build_tree()
+        tree = self._tree
+        n = len(tree) - 1
+        step = 1
+        while step * 2 <= n:
+            step *= 2
+        slot = 0
+        remaining = position + 1
+        while step:
+            nxt = slot + step
+            if nxt <= n and tree[nxt] < remaining:
+                slot = nxt
+                remaining -= tree[nxt]
+            step //= 2
+        return slot
+
+
+def _filetype_matcher(filetypes):
+    """Returns a function that tests file names against Tk dialog filetypes
+    (e.g. [('Python', '*.py'), ('Text', ('.txt', '*.csv'))]); None if the
+    filetypes match all files."""
+    patterns = []
+    for _, pattern in filetypes:
+        if isinstance(pattern, (tuple, list)):
+            patterns.extend(pattern)
+        else:
+            patterns.extend(pattern.split())
+    regexes = []
+    for pattern in patterns:
+        if pattern in ("*", "*.*"):
+            return None
+        if not pattern.startswith("*"):
+            pattern = "*" + pattern
+        regexes.append(fnmatch.translate(pattern))
+    flags = re.IGNORECASE if os.name == "nt" else 0
+    return re.compile("|".join(regexes), flags).match
+
+
+def _walk_files(top, match=None, cancel=None):
+    """Yields the paths of all files under top (depth-first, no symlinked
+    directories) whose names satisfy match. Stops when cancel is set.
+    Unreadable directories are skipped."""
+    stack = [top]
+    while stack:
+        if cancel is not None and cancel.is_set():
+            return
+        path = stack.pop()
+        try:
+            if scandir is not None:
+                entries = [(e.name, e.path, e.is_dir(follow_symlinks=False))
+                           for e in scandir(path)]
+            else:
+                entries = []
+                for name in os.listdir(path):
+                    full = os.path.join(path, name)
+                    entries.append((name, full, os.path.isdir(full) and
+                                    not os.path.islink(full)))
+        except OSError as e:
+            logging.debug("Skipping {}: {}".format(path, e))
+            continue
+        for name, full, is_dir in entries:
+            if is_dir:
+                stack.append(full)
+            elif match is None or match(name):
+                yield full
+
+
+class _FolderScan(object):
+    """Walks a folder on a worker and hands the matching paths to the UI
+    thread as they are found. The walk pauses while `limit` paths are
+    waiting, so a large folder is never buffered in full."""
+    def __init__(self, top, match, limit):
+        self.top = top
+        self.match = match
+        self.limit = limit
+        self.cancel = threading.Event()
+        self._found = []
+        self._done = False
+        self._ready = threading.Condition()
+
+    def run(self):
+        """Walks the folder; runs on a worker."""
+        try:
+            for path in _walk_files(self.top, self.match, self.cancel):
+                with self._ready:
+                    while (len(self._found) >= self.limit and
+                           not self.cancel.is_set()):
+                        self._ready.wait(0.1)
+                    if self.cancel.is_set():
+                        return
+                    self._found.append(path)
+        finally:
+            with self._ready:
+                self._done = True
+        return
+
+    def take(self, count):
+        """Returns (up to count of the paths found since the last call,
+        True if the walk has ended and no paths are left); runs on the UI
+        thread."""
+        with self._ready:
+            found = self._found[:count]
+            del self._found[:count]
+            done = self._done and not self._found
+            self._ready.notify()
+        return found, done
+
+
+# Optional FileTree columns and their headings
+METADATA_COLUMNS = OrderedDict([("size", "Size"),
+                                ("mtime", "Modified"),
+                                ("lines", "Lines"),
+                                ("checksum", "Checksum")])
+# Columns that require reading the whole file
+_EXPENSIVE_COLUMNS = ("lines", "checksum")
+
+
+def _read_chunks(path, size=1 << 20):
+    """Yields the content of a file in binary chunks."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _count_lines(path):
+    """Counts the lines of a file without reading it into memory."""
+    lines = 0
+    last = b""
+    for chunk in _read_chunks(path):
+        lines += chunk.count(b"\n")
+        last = chunk
+    # A final line without a line break
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+def _file_checksum(path):
+    """Returns the SHA-1 hex digest of a file's content."""
+    digest = hashlib.sha1()
+    for chunk in _read_chunks(path):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _format_size(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024.0
+    return "{:,.0f} {}".format(size, unit) if unit == "B" else \
+        "{:,.1f} {}".format(size, unit)
+
+
+class MetadataCache(object):
+    """Persistent cache of file metadata keyed by (path, size, mtime).
+
+    Entries are stored in a JSON file and are only returned while the file's
+    size and modification time are unchanged, so reopening the same inputs
+    does not read their content again.
+    """
+    def __init__(self, filename=None, save_interval=5, max_entries=50000):
+        """
+        Args:
+            filename (str): cache file (default: ~/.tkit/metadata.json)
+            save_interval (int): minimum seconds between saves from maybe_save
+            max_entries (int): number of files kept; entries of missing files,
+                then the least recently stored ones, are dropped on save
+        """
+        if filename is None:
+            filename = os.path.join(os.path.expanduser("~"), ".tkit",
+                                    "metadata.json")
+        self.filename = filename
+        self.save_interval = save_interval
+        self.max_entries = max_entries
+        self._data = None
+        self._dirty = False
+        self._saved = _clock()
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._data is None:
+            try:
+                with open(self.filename) as f:
+                    self._data = json.load(f)
+            except (IOError, OSError, ValueError):
+                self._data = {}
+        return self._data
+
+    def get(self, path, size, mtime):
+        """Returns the cached values of a file or an empty dict."""
+        with self._lock:
+            entry = self._load().get(path)
+        if entry and entry["size"] == size and entry["mtime"] == mtime:
+            return entry
+        return {}
+
+    def set(self, path, size, mtime, **values):
+        """Stores values (e.g. lines=10) for a file."""
+        with self._lock:
+            data = self._load()
+            entry = data.get(path)
+            if not entry or entry["size"] != size or entry["mtime"] != mtime:
+                entry = data[path] = {"size": size, "mtime": mtime}
+            entry.update(values)
+            entry["stored"] = time.time()
+            self._dirty = True
+        return
+
+    def _prune(self):
+        """Shrinks the cache to 90% of max_entries, so it is not pruned on
+        every save; dropping entries of missing files first."""
+        data = self._data
+        if len(data) <= self.max_entries:
+            return
+        for path in [p for p in data if not os.path.exists(p)]:
+            del data[path]
+        excess = len(data) - int(self.max_entries * 0.9)
+        if excess > 0:
+            oldest = sorted(data, key=lambda p: data[p].get("stored", 0))
+            for path in oldest[:excess]:
+                del data[path]
+        return
+
+    def save(self):
+        """Writes the cache file if anything changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._prune()
+            text = json.dumps(self._data)
+            self._dirty = False
+            self._saved = _clock()
+        try:
+            folder = os.path.dirname(self.filename)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            temp = self.filename + ".tmp"
+            with open(temp, "w") as f:
+                f.write(text)
+            if os.name == "nt" and os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(temp, self.filename)
+        except (IOError, OSError) as e:
+            logging.warning("Could not save {}: {}".format(self.filename, e))
+        return
+
+    def maybe_save(self):
+        """Saves if save_interval seconds have passed since the last save."""
+        if _clock() - self._saved >= self.save_interval:
+            self.save()
+        return
+
+
+_METADATA_CACHE = []
+
+
+def _default_metadata_cache():
+    """Returns the MetadataCache shared by all FileTrees."""
+    if not _METADATA_CACHE:
+        _METADATA_CACHE.append(MetadataCache())
+    return _METADATA_CACHE[0]
+
+
+def file_metadata(path, columns, cache=None):
+    """Returns a dict of metadata values for the given columns.
+    Expensive values (lines, checksum) are taken from the cache if the file
+    is unchanged and stored in it otherwise."""
+    st = os.stat(path)
+    values = {"size": st.st_size, "mtime": st.st_mtime}
+    wanted = [c for c in columns if c in _EXPENSIVE_COLUMNS]
+    if not wanted:
+        return values
+    cached = cache.get(path, st.st_size, st.st_mtime) if cache else {}
+    computed = {}
+    for column in wanted:
+        if column in cached:
+            values[column] = cached[column]
+        elif column == "lines":
+            values[column] = computed[column] = _count_lines(path)
+        elif column == "checksum":
+            values[column] = computed[column] = _file_checksum(path)
+    if cache is not None and computed:
+        cache.set(path, st.st_size, st.st_mtime, **computed)
+    return values
+
+
+def _partial_checksum(path, size=64 * 1024):
+    """Returns the SHA-1 hex digest of the first and last size bytes."""
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(size))
+        f.seek(0, 2)
+        end = f.tell()
+        if end > size:
+            f.seek(max(size, end - size))
+            digest.update(f.read(size))
+    return digest.hexdigest()
+
+
+def _pool_map(pool, func, items, chunk_size=256):
+    """Calls func for each item on a pool, in chunks to limit the number of
+    futures. Returns (item, result) pairs; items that raise IOError/OSError
+    are skipped."""
+    def run_chunk(chunk):
+        results = []
+        for item in chunk:
+            try:
+                results.append((item, func(item)))
+            except (IOError, OSError) as e:
+                logging.debug("Skipping {}: {}".format(item, e))
+        return results
+
+    futures = [pool.submit(run_chunk, items[i:i + chunk_size])
+               for i in range(0, len(items), chunk_size)]
+    results = []
+    for future in futures:
+        results.extend(future.result())
+    return results
+
+
+def find_duplicates(paths, pool=None, cache=None, partial_size=64 * 1024):
+    """Groups files with identical content.
+
+    Files are first grouped by size; only files that share a size are hashed
+    on their first and last partial_size bytes, and only files that share
+    that partial hash are hashed in full. Paths to the same file (hard or
+    symbolic links) are grouped without being read. Hashing runs on a worker
+    pool and full checksums are stored in the metadata cache.
+    Args:
+        paths (list): file paths
+        pool (WorkerPool): pool to hash on (default: the shared pool)
+        cache (MetadataCache): cache of full checksums
+        partial_size (int): number of bytes hashed at each end of a file
+    Returns a list of groups (lists of paths), largest files first.
+    """
+    if pool is None:
+        pool = _default_pool()
+    by_size = defaultdict(list)
+    for path, st in _pool_map(pool, os.stat, list(paths)):
+        by_size[st.st_size].append((path, st))
+
+    def by_key(groups, key_func):
+        """Splits groups by key_func, hashing one path per physical file."""
+        candidates = {}
+        for group in groups:
+            for path, st in group:
+                # st_ino is 0 where inodes are not supported
+                candidates.setdefault((st.st_dev, st.st_ino or path), path)
+        keys = dict(_pool_map(pool, key_func, list(candidates.values())))
+        split = defaultdict(list)
+        for i, group in enumerate(groups):
+            for path, st in group:
+                key = keys.get(candidates[(st.st_dev, st.st_ino or path)])
+                if key is not None:
+                    split[(i, key)].append((path, st))
+        return [g for g in split.values() if len(g) > 1]
+
+    def full_checksum(path):
+        return file_metadata(path, ("checksum",), cache)["checksum"]
+
+    groups = [g for size, g in sorted(by_size.items(), reverse=True)
+              if len(g) > 1]
+    groups = by_key(groups, lambda p: _partial_checksum(p, partial_size))
+    # Files no longer than both partial reads were already hashed in full
+    small = [g for g in groups if g[0][1].st_size <= 2 * partial_size]
+    large = [g for g in groups if g[0][1].st_size > 2 * partial_size]
+    groups = small + by_key(large, full_checksum)
+    if cache is not None:
+        cache.maybe_save()
+    groups.sort(key=lambda g: -g[0][1].st_size)
+    return [sorted(path for path, st in group) for group in groups]
+
+
 class FileTree(ttk.LabelFrame):  # TODO: Consider "ListTree" as name
     """Allows user to easily manipulate columns of data."""
-    def __init__(self, root):
+    def __init__(self, root, virtual=False, height=5, columns=(),
+                 cache=None):
+        """
+        Args:
+            root: parent widget
+            virtual (bool): only create Treeview rows for the visible paths;
+                use for lists of many thousands of files
+            height (int): number of visible rows
+            columns (tuple): metadata columns to show (see METADATA_COLUMNS);
+                computed in the background for the visible rows only
+            cache (MetadataCache): cache of expensive column values
+                (default: a cache shared by all FileTrees)
+        """
         self.root = root
+        self.virtual = virtual
+        self.height = height
+        self.columns = tuple(columns)
+        for column in self.columns:
+            if column not in METADATA_COLUMNS:
+                raise ValueError("Unknown column: {}".format(column))
+        self.cache = cache
+        if self.columns and cache is None:
+            self.cache = _default_metadata_cache()
+        # Metadata computed so far and paths being computed; UI thread only
+        self._metadata = {}
+        self._metadata_pending = set()
+        # Results handed over by the workers: (path, values), or
+        # (None, paths) once a worker is done with its paths
+        self._metadata_updates = deque()
+        self._metadata_after = None
+        self._metadata_polling = False
 
         # Vars
-        self.fileList = []
+        self._index = _PathIndex()
+        self._offset = 0
+        # Running folder scan
+        self._scan = None
 
         # Container
         self.container = ttk.LabelFrame(root, text=' Tabel Label ')
         self.container.pack(side='top', anchor='n', fill='x',
                             expand='yes', padx=5, pady=5)
+        # A scan must not keep walking once the window is gone
+        self.container.bind("<Destroy>", self._stop_scan, add="+")
         self.headers = "Col 1"
 
         # Tree
-        self.tree = ttk.Treeview(self.container, show="headings", height=5)
-        self.tree["columns"] = "single"
+        self.tree = ttk.Treeview(self.container, show="headings",
+                                 height=height)
+        self.tree["columns"] = ("single",) + self.columns
         self.tree.column("single", width=200)
         self.tree.heading("single", text="Input Files")
+        for column in self.columns:
+            self.tree.column(column, width=80, stretch=False)
+            self.tree.heading(column, text=METADATA_COLUMNS[column])
+        if self.columns:
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>",
+                             "<KeyRelease>", "<Configure>"):
+                self.tree.bind(sequence, self._schedule_metadata, add="+")
+            self.container.bind("<Destroy>", self._save_cache, add="+")
+        if virtual:
+            # Reuse a fixed set of rows and scroll the data through them
+            self.scrollbar = ttk.Scrollbar(self.container, orient="vertical",
+                                           command=self._yview)
+            self.scrollbar.pack(side="right", fill="y")
+            self._rows = ["row{}".format(i) for i in range(height)]
+            for row in self._rows:
+                self.tree.insert("", "end", iid=row, values=("",))
+            for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+                self.tree.bind(sequence, self._on_wheel)
         self.tree.pack(fill='x')
 
         # Duplicate Warning
@@ -707,6 +3193,21 @@ class FileTree(ttk.LabelFrame):  # TODO: Consider "ListTree" as name
                                   command=self.add_file)
         self.Add_but.pack(side='left')
 
+        # Add folder button - adds matching files under a directory
+        self.AddDir_but = ttk.Button(self.container, text='Add Folder',
+                                     command=self.add_folder)
+        self.AddDir_but.pack(side='left')
+
+        # Duplicates button - finds files with identical content
+        self.Dupes_but = ttk.Button(self.container, text='Duplicates',
+                                    command=self.find_duplicates)
+        self.Dupes_but.pack(side='left')
+
+        # Folder scan status and cancel button; shown while scanning
+        self.scan_label = ttk.Label(self.container, text="")
+        self.Cancel_but = ttk.Button(self.container, text='Cancel',
+                                     command=self.cancel_scan)
+
         # Remove button - removes selected table contents
         self.Remove_but = ttk.Button(self.container, text='Remove',
                                      command=self.rm_file)
@@ -715,6 +3216,118 @@ class FileTree(ttk.LabelFrame):  # TODO: Consider "ListTree" as name
         # Default filetypes
         self.FILEOPENOPTIONS = dict(defaultextension='*.*',
                                     filetypes=[('All files', '*.*')])
+        if virtual:
+            self._render()
+
+    def _row_values(self, path):
+        """Returns the displayed values of a path's row."""
+        if not self.columns:
+            return (path,)
+        metadata = self._metadata.get(path, {})
+        values = [path]
+        for column in self.columns:
+            value = metadata.get(column)
+            if value is None:
+                values.append("")
+            elif column == "size":
+                values.append(_format_size(value))
+            elif column == "mtime":
+                values.append(time.strftime("%Y-%m-%d %H:%M",
+                                            time.localtime(value)))
+            elif column == "lines":
+                values.append("{:,}".format(value))
+            else:
+                values.append(value[:12])
+        return tuple(values)
+
+    def _visible_paths(self):
+        """Returns the paths of the rows that are currently visible."""
+        if self.virtual:
+            return self._index[self._offset:self._offset + self.height]
+        total = len(self._index)
+        first, last = self.tree.yview()
+        start = int(float(first) * total)
+        return self._index[start:start + self.height + 1]
+
+    def _schedule_metadata(self, event=None):
+        """Computes metadata for the visible rows after a short delay."""
+        if self.columns and self._metadata_after is None:
+            self._metadata_after = self.tree.after(100, self._load_metadata)
+        return
+
+    def _load_metadata(self):
+        """Starts a worker for visible rows without metadata; UI thread."""
+        self._metadata_after = None
+        paths = [p for p in self._visible_paths()
+                 if p not in self._metadata and
+                 p not in self._metadata_pending]
+        if not paths:
+            return
+        self._metadata_pending.update(paths)
+        cheap = [c for c in self.columns if c not in _EXPENSIVE_COLUMNS]
+        updates = self._metadata_updates
+
+        def compute():
+            # Only hands results over; the UI thread owns the metadata
+            try:
+                # Show sizes and dates first; checksums can take a while
+                for column_set in (cheap, self.columns):
+                    if not column_set:
+                        continue
+                    for path in paths:
+                        try:
+                            values = file_metadata(path, column_set,
+                                                   self.cache)
+                        except (IOError, OSError) as e:
+                            logging.debug("No metadata for {}: {}".format(
+                                path, e))
+                            values = {}
+                        updates.append((path, values))
+                if self.cache is not None:
+                    self.cache.maybe_save()
+            except Exception:
+                logging.exception("Computing file metadata failed")
+            finally:
+                updates.append((None, paths))
+            return
+
+        _submit(self.tree, compute)
+        if not self._metadata_polling:
+            self._metadata_polling = True
+            self._poll_metadata()
+        return
+
+    def _poll_metadata(self):
+        """Shows computed metadata while workers are running; UI thread."""
+        updated = set()
+        while self._metadata_updates:
+            path, values = self._metadata_updates.popleft()
+            if path is None:
+                self._metadata_pending.difference_update(values)
+                continue
+            self._metadata[path] = values
+            updated.add(path)
+        if updated and self.virtual:
+            self._render()
+        elif updated:
+            for path in updated:
+                if self.tree.exists(path):
+                    self.tree.item(path, values=self._row_values(path))
+        if self._metadata_pending:
+            self.tree.after(100, self._poll_metadata)
+        else:
+            self._metadata_polling = False
+        return
+
+    def _save_cache(self, event=None):
+        if self.cache is not None:
+            self.cache.save()
+        return
+
+    @property
+    def fileList(self):
+        """List of the files in the tree (in order, without duplicates)."""
+        return list(self._index)
 
     def set_filetypes(self, default_ext, types_tupelist):
         self.FILEOPENOPTIONS = None
@@ -725,29 +3338,218 @@ class FileTree(ttk.LabelFrame):  # TODO: Consider "ListTree" as name
         """Opens file browser and places selected file(s) in tree."""
         new_file = tkFileDialog.askopenfilenames(parent=self.root,
                                                  **self.FILEOPENOPTIONS)
-        print(new_file)
-        for f in new_file:
-            self.fileList.append(f)
-            self.tree.insert("", 'end', values=f)
-
-        if len(self.fileList) != len(set(self.fileList)):
+        logging.debug(new_file)
+        self.add_paths(new_file)
+
+    def add_paths(self, paths):
+        """Adds paths to the tree in one pass; duplicates are dropped.
+        Returns the list of paths that were added."""
+        paths = list(paths)
+        added = self._index.extend(paths)
+        if self.virtual:
+            self._render()
+        else:
+            insert = self.tree.insert
+            row_values = self._row_values
+            for path in added:
+                insert("", "end", iid=path, values=row_values(path))
+            self._schedule_metadata()
+        if len(added) != len(paths):
             self.warning.pack(side='bottom')
+        return added
+
+    def add_folder(self, path=None, batch_size=1000, max_batches=4):
+        """Adds all files under a directory that match the filetypes.
+        The directory is walked by a background worker and the paths found
+        are added to the tree in batches, every 50 ms or right after the
+        last batch while more are waiting. The worker pauses while
+        batch_size * max_batches paths are waiting, so nothing is buffered
+        in full. The scan stops when the tree is destroyed.
+        Args:
+            path (str): directory to scan; asks the user if not given
+            batch_size (int): maximum number of paths added to the tree at
+                once; smaller batches keep the UI more responsive
+            max_batches (int): number of batches the worker may queue
+        """
+        if path is None:
+            path = tkFileDialog.askdirectory(parent=self.root)
+        if not path:
+            return
+        self.cancel_scan()
+        scan = _FolderScan(path, _filetype_matcher(
+            self.FILEOPENOPTIONS["filetypes"]), batch_size * max_batches)
+        self._scan = scan
+        _submit(self.tree, scan.run)
+        self.scan_label.config(text="Scanning...")
+        self.scan_label.pack(side='left', padx=5)
+        self.Cancel_but.pack(side='left')
+        self._poll_scan(scan, 0, batch_size)
+        return
+
+    def cancel_scan(self):
+        """Stops a running folder scan; files found so far are kept."""
+        self._stop_scan()
+        self.scan_label.pack_forget()
+        self.Cancel_but.pack_forget()
+        return
+
+    def _stop_scan(self, event=None):
+        """Stops the scan worker; also called when the tree is destroyed."""
+        if self._scan is not None:
+            self._scan.cancel.set()
+        self._scan = None
+        return
+
+    def _poll_scan(self, scan, found, batch_size):
+        """Adds a batch of the paths found by the scan worker; runs on the
+        UI."""
+        if scan is not self._scan:
+            # Cancelled, destroyed or replaced by a newer scan
+            return
+        paths, finished = scan.take(batch_size)
+        if paths:
+            self.add_paths(paths)
+            found += len(paths)
+            self.scan_label.config(text="Scanning... {:,} files".format(found))
+        if finished:
+            self.cancel_scan()
+            return
+        # Full batch: more paths are probably waiting
+        delay = 1 if len(paths) == batch_size else 50
+        self.tree.after(delay, self._poll_scan, scan, found, batch_size)
+        return
+
+    def find_duplicates(self, callback=None):
+        """Finds files in the tree with identical content in the background.
+        Args:
+            callback (function): called with the list of duplicate groups;
+                by default the groups are shown with show_duplicates
+        Returns a Future of the groups.
+        """
+        app = self.tree._root()
+        pool = app.executor if hasattr(app, "executor") else _default_pool()
+        # Checksums are kept even if the tree shows no metadata columns
+        cache = self.cache
+        if cache is None:
+            cache = _default_metadata_cache()
+        future = Future()
+        paths = self.fileList
+
+        def run():
+            # Runs outside of the pool since it waits on the pool's results
+            try:
+                groups = find_duplicates(paths, pool, cache)
+                cache.save()
+                future._set_result(groups)
+            except Exception as e:
+                logging.exception("Duplicate search failed")
+                future._set_exception(e)
+            return
+
+        future._set_running()
+        finder = ThreadedClient("Duplicates", run)
+        finder.daemon = True
+        finder.start()
+        self.Dupes_but.config(state="disabled")
+
+        def finished(future):
+            self.Dupes_but.config(state="normal")
+            if future.exception() is None:
+                (callback or self.show_duplicates)(future.result())
+            return
+
+        # On the UI thread, inside an App or not
+        _when_done(self.tree, future, finished)
+        return future
+
+    def show_duplicates(self, groups):
+        """Shows groups of duplicate files in a window."""
+        window = tk.Toplevel(self.container)
+        window.title("Duplicate Files")
+        if not groups:
+            ttk.Label(window, text="No duplicates found.").pack(padx=10,
+                                                                pady=10)
+            return
+        tree = ttk.Treeview(window, show="tree", height=15)
+        scrollbar = ttk.Scrollbar(window, orient="vertical",
+                                  command=tree.yview)
+        tree.config(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        tree.pack(fill="both", expand="yes")
+        for group in groups:
+            parent = tree.insert("", "end", open=True, text="{} files".format(
+                len(group)))
+            for path in group:
+                tree.insert(parent, "end", text=path)
+        return
+
+    def _focused_path(self):
+        """Returns the path of the focused row or None."""
+        focus = self.tree.focus()
+        if not focus:
+            return None
+        if not self.virtual:
+            return focus
+        position = self._offset + self._rows.index(focus)
+        return self._index[position] if position < len(self._index) else None
 
     def rm_file(self):
         """Removes selected file from tree."""
-        current_val = self.tree.item(self.tree.focus())['values'][0]
-        self.tree.delete(self.tree.focus())
-        self.fileList.remove(current_val)
-        # Attempts to remove duplicate warning
-        if len(self.fileList) == len(set(self.fileList)):
-            self.warning.pack_forget()
+        current_val = self._focused_path()
+        if current_val is None:
+            return
+        self._index.remove(current_val)
+        if self.virtual:
+            self._render()
+        else:
+            self.tree.delete(current_val)
+        # Removes duplicate warning
+        self.warning.pack_forget()
 
     def get_list(self):
         """Returns selected list of selected files."""
-        self.fileList = list(set(self.fileList))
-        print(self.fileList)
+        logging.debug(self.fileList)
         return self.fileList
 
+    # Virtual mode
+
+    def _render(self):
+        """Shows the paths at the current offset in the reused rows."""
+        total = len(self._index)
+        self._offset = max(0, min(self._offset, total - self.height))
+        visible = self._index[self._offset:self._offset + self.height]
+        for i, row in enumerate(self._rows):
+            if i < len(visible):
+                self.tree.item(row, values=self._row_values(visible[i]))
+                self.tree.move(row, "", i)
+            else:
+                self.tree.detach(row)
+        if total:
+            self.scrollbar.set(float(self._offset) / total,
+                               float(self._offset + len(visible)) / total)
+        else:
+            self.scrollbar.set(0, 1)
+        self._schedule_metadata()
+        return
+
+    def _yview(self, *args):
+        """Scrollbar command."""
+        if args[0] == "moveto":
+            self._offset = int(float(args[1]) * len(self._index))
+        elif args[0] == "scroll":
+            step = self.height if args[2] == "pages" else 1
+            self._offset += int(args[1]) * step
+        self.tree.selection_set(())
+        self._render()
+        return
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self._yview("scroll", -3, "units")
+        else:
+            self._yview("scroll", 3, "units")
+        return "break"
+
 
 '''
 class _App(tk.Frame):
@@ -766,10 +3568,120 @@ if __name__ == '__main__':
 '''
 
 
+# =============================================================================
+# ICONS
+
+class IconCache(object):
+    """Reference-counted PhotoImages shared by all widgets of a Tk root.
+
+    Each icon (and each scaled variant of it) is decoded once per
+    interpreter; images are deleted when the last widget releases them,
+    unless they were preloaded.
+    """
+    def __init__(self, root):
+        self.root = root
+        # (path, scale) -> [image, reference count]
+        self._images = {}
+        self._pinned = set()
+
+    @classmethod
+    def for_widget(cls, widget):
+        """Returns the icon cache of the widget's root."""
+        root = widget._root()
+        cache = getattr(root, "_tkit_icons", None)
+        if cache is None:
+            cache = cls(root)
+            root._tkit_icons = cache
+        return cache
+
+    @staticmethod
+    def _key(name, scale):
+        """Icons are referenced by file path or by file name in ICONS."""
+        if not os.path.dirname(name):
+            name = os.path.join(ICONS, name)
+        return os.path.normcase(os.path.abspath(name)), scale
+
+    def acquire(self, name, scale=1):
+        """Returns the (shared) image of an icon; raises tk.TclError if it
+        cannot be loaded. Call release() when it is no longer used.
+        Args:
+            name (str): icon file path or name of a file in ICONS
+            scale (float): size factor, e.g. 2 or 0.5
+        """
+        key = self._key(name, scale)
+        entry = self._images.get(key)
+        if entry is None:
+            if scale == 1:
+                image = tk.PhotoImage(master=self.root, file=key[0])
+            else:
+                base = self.acquire(name)
+                ratio = fractions.Fraction(scale).limit_denominator(8)
+                image = base.zoom(ratio.numerator)
+                if ratio.denominator > 1:
+                    image = image.subsample(ratio.denominator)
+                self.release(name)
+            entry = self._images[key] = [image, 0]
+        entry[1] += 1
+        return entry[0]
+
+    def release(self, name, scale=1):
+        """Releases an image returned by acquire()."""
+        key = self._key(name, scale)
+        entry = self._images.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0 and key not in self._pinned:
+            del self._images[key]
+        return
+
+    def preload(self, folder=ICONS, scales=(1,)):
+        """Decodes all icons in a folder and keeps them for the app's life."""
+        for name in sorted(os.listdir(folder)):
+            if os.path.splitext(name)[1].lower() not in (".gif", ".png",
+                                                          ".ppm", ".pgm"):
+                continue
+            for scale in scales:
+                path = os.path.join(folder, name)
+                try:
+                    self.acquire(path, scale)
+                except tk.TclError as e:
+                    logging.debug("Icon {} not loaded: {}".format(name, e))
+                    continue
+                self._pinned.add(self._key(path, scale))
+        return
+
+    def __len__(self):
+        return len(self._images)
+
+
+def preload_icons(widget, folder=ICONS, scales=(1,)):
+    """Decodes all icons in a folder for the app that owns widget."""
+    IconCache.for_widget(widget).preload(folder, scales)
+    return
+
+
+def icon_button(button, name, fallback_text="", scale=1):
+    """Shows a shared icon on a button; the icon is released when the button
+    is destroyed. Falls back to text if the icon cannot be loaded.
+    Returns the image or None."""
+    cache = IconCache.for_widget(button)
+    try:
+        image = cache.acquire(name, scale)
+    except tk.TclError as e:
+        logging.debug("Icon {} not loaded: {}".format(name, e))
+        button.config(text=fallback_text)
+        return None
+    button.config(image=image)
+    button.bind("<Destroy>", lambda event: cache.release(name, scale),
+                add="+")
+    return image
+
+
 # =============================================================================
 # BROWSEFILE
 
-class BrowseFile(ttk.LabelFrame):
+class BrowseFile(ttk.LabelFrame, _ValidatedInput):
     """Select a file(s) and add it to an entrybox"""
     def __init__(self, root=None):
         self.root = root
@@ -785,26 +3697,17 @@ class BrowseFile(ttk.LabelFrame):
 
         # Browse Entry
         self.fileVar = tk.StringVar()
-        self.fileEntry = ttk.Entry(self.Container, width=30)
+        self.fileEntry = ttk.Entry(self.Container, width=30,
+                                   textvariable=self.fileVar)
         self.fileEntry.pack(side='left', anchor='nw', fill='x',
                             expand='yes', padx=5, pady=5)
 
         # TODO: Copy/paste
 
         # Browse Button
-        try:
-            # Use the folder icon
-            self.opengif = tk.PhotoImage(file=OPENFOLDER)
-            self.browseBut = ttk.Button(self.Container,
-                                        command=self._browse)
-            self.browseBut.config(image=self.opengif)
-        except:
-            # Use an elipse
-            self.browseBut = ttk.Button(self.Container,
-                                        text=" ... ",
-                                        command=self._browse)
-        self.browseBut.pack(side='right', anchor='ne',
-                            padx=5, pady=5)
+        self.browseBut = ttk.Button(self.Container, command=self._browse)
+        self.opengif = icon_button(self.browseBut, OPENFOLDER, " ... ")
+        self.browseBut.pack(side='right', anchor='ne', padx=5, pady=5)
 
     def set_parent(self, parent):
         self.root = parent
@@ -829,8 +3732,11 @@ class BrowseFile(ttk.LabelFrame):
     def get(self):
         return self.fileVar.get()
 
+    def _validation_widgets(self):
+        return self.fileEntry, self.fileVar, self.Container
 
-class BrowseDir(ttk.LabelFrame):
+
+class BrowseDir(ttk.LabelFrame, _ValidatedInput):
     """Select a directory and add it to an entrybox."""
     def __init__(self, root):
         self.root = root
@@ -842,20 +3748,14 @@ class BrowseDir(ttk.LabelFrame):
 
         # Browse Entry
         self.fileVar = tk.StringVar()
-        self.fileEntry = ttk.Entry(self.Container, width=30)
+        self.fileEntry = ttk.Entry(self.Container, width=30,
+                                   textvariable=self.fileVar)
         self.fileEntry.pack(side='left', anchor='nw', fill='x',
                             expand='yes', padx=5, pady=5)
 
         # Browse Button
-        try:
-            # Use the folder icon
-            self.opengif = tk.PhotoImage(file=OPENFOLDER)
-            self.browseBut = ttk.Button(self.Container, command=self._browse)
-            self.browseBut.config(image=self.opengif)
-        except:
-            # Use an elipse
-            self.browseBut = ttk.Button(self.Container, text=" ... ",
-                                        command=self._browse)
+        self.browseBut = ttk.Button(self.Container, command=self._browse)
+        self.opengif = icon_button(self.browseBut, OPENFOLDER, " ... ")
         self.browseBut.pack(side='right', anchor='ne', padx=5, pady=5)
 
     def _browse(self):
@@ -868,6 +3768,9 @@ class BrowseDir(ttk.LabelFrame):
     def get(self):
         return self.fileVar.get()
 
+    def _validation_widgets(self):
+        return self.fileEntry, self.fileVar, self.Container
+
 
 '''
 class _App(tk.Frame):
@@ -893,7 +3796,84 @@ if __name__ == '__main__':
 # TODO: move to own package with statusbar -- renamed to progressbar
 # TODO: create new status bar object from frame
 
-import itertools
+
+class _Animator(object):
+    """Drives all active progress widgets of a Tk root from one after() timer.
+
+    Each tick shows the frame that is due for every active widget, skipping
+    frames when the loop runs late, and sleeps until the next frame is due.
+    No timer is scheduled while no widget is active.
+    """
+    def __init__(self, root):
+        self.root = root
+        self._active = OrderedDict()
+        self._after_id = None
+        self.stats = {"ticks": 0, "skipped": 0}
+
+    @classmethod
+    def for_widget(cls, widget):
+        """Returns the animator of the widget's root, creating it if needed."""
+        root = widget._root()
+        animator = getattr(root, "_tkit_animator", None)
+        if animator is None:
+            animator = cls(root)
+            root._tkit_animator = animator
+        return animator
+
+    def add(self, progress):
+        """Starts animating a progress widget; UI thread only."""
+        if progress in self._active:
+            return
+        # Start time, last frame shown
+        self._active[progress] = [_clock(), -1]
+        progress.pack(side=progress.side, anchor=progress.anchor,
+                      padx=progress.padx, pady=progress.pady)
+        progress._show_cancel(True)
+        self._reschedule(0)
+        return
+
+    def remove(self, progress):
+        """Stops animating a progress widget; UI thread only."""
+        if self._active.pop(progress, None) is not None:
+            progress.pack_forget()
+            progress._show_cancel(False)
+        if not self._active and self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        return
+
+    def _reschedule(self, delay):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(delay, self._tick)
+        return
+
+    def _tick(self):
+        """Shows the current frame of each active widget."""
+        self._after_id = None
+        self.stats["ticks"] += 1
+        now = _clock()
+        next_due = None
+        for progress, state in list(self._active.items()):
+            # Stopped from a thread that could not touch the widget
+            if progress._stop.is_set():
+                self.remove(progress)
+                continue
+            start, last = state
+            frame = int((now - start) / progress.speed)
+            if frame != last:
+                if last >= 0 and frame - last > 1:
+                    self.stats["skipped"] += frame - last - 1
+                state[1] = frame
+                progress.config(
+                    text=progress.frames[frame % len(progress.frames)])
+            due = start + (frame + 1) * progress.speed - now
+            if next_due is None or due < next_due:
+                next_due = due
+        if next_due is not None:
+            self._after_id = self.root.after(
+                max(1, int(next_due * 1000)), self._tick)
+        return
 
 
 #class _Progress(threading.Thread, tk.Label):
@@ -906,8 +3886,15 @@ class _Progress(tk.Label):
         self.anchor = anchor
         self.padx = padx
         self.pady = pady
-        self.cycle = []
+        self.frames = [""]
         self._stop = threading.Event()
+        # Numbers run() and stop() calls; a show or hide queued from a
+        # worker is dropped if a later call was made in the meantime
+        self._generation = 0
+        self._generation_lock = threading.Lock()
+        # Cancelled by the Cancel button shown next to the widget
+        self.cancel_token = None
+        self._cancel_button = None
         setattr(root, "spinner", self)
         #try:
         #    root.add_command("start_spinner", self.run)
@@ -916,47 +3903,88 @@ class _Progress(tk.Label):
         #    root.root.add_command("start_spinner", self.run)
         #    root.root.add_command("stop_spinner", self.run)
 
-    def run(self, event=None, tasks=[]):
-        """Executes the progress bar as a thread."""
-        #self._stop.clear()
-        self.pack(side=self.side, anchor=self.anchor,
-                  padx=self.padx, pady=self.pady)
-        while not self._stop.is_set():
-            self.config(text=self.cycle.next())
-            self.update()
-            time.sleep(self.speed)
-        self.pack_forget()
+    def run(self, event=None, tasks=[], token=None):
+        """Shows and starts animating the progress widget.
+        Returns immediately; safe to call from any thread of an App.
+        If a CancelToken is given, a Cancel button that cancels it is shown
+        next to the widget."""
+        self.cancel_token = token
+        _ui_call(self, self._animate, self._next_generation(True), True)
+        return
+
+    def _next_generation(self, running):
+        """Sets the running state and returns the number of this call."""
+        with self._generation_lock:
+            if running:
+                self._stop.clear()
+            else:
+                self._stop.set()
+            self._generation += 1
+            return self._generation
+
+    def _animate(self, generation, show):
+        """Adds to or removes from the animation; UI thread only."""
+        if generation != self._generation:
+            # Superseded by a later run() or stop()
+            return
+        animator = _Animator.for_widget(self)
+        if show:
+            animator.add(self)
+        else:
+            animator.remove(self)
+        return
+
+    def cancel(self, event=None):
+        """Cancels the token given to run()."""
+        if self.cancel_token is not None:
+            self.cancel_token.cancel()
+        if self._cancel_button is not None:
+            _ui_call(self, self._cancel_button.state, ["disabled"])
+        return
+
+    def _show_cancel(self, show):
+        """Shows or hides the Cancel button; UI thread only."""
+        if show and self.cancel_token is not None:
+            if self._cancel_button is None:
+                self._cancel_button = ttk.Button(self.master, text="Cancel",
+                                                 command=self.cancel)
+            self._cancel_button.state(["!disabled"])
+            self._cancel_button.pack(side=self.side, anchor=self.anchor,
+                                     padx=self.padx, pady=self.pady)
+        elif self._cancel_button is not None:
+            self._cancel_button.pack_forget()
+        return
 
     def stop(self, event=None):
-        """Stops the progress bar."""
-        time.sleep(1)
-        self._stop.set()
+        """Stops and hides the progress widget; safe to call from any thread.
+        """
+        generation = self._next_generation(False)
+        # Without a dispatcher the next animation tick removes the widget
+        if _dispatcher_for(self) is not None:
+            _ui_call(self, self._animate, generation, False)
         return
-    '''
+
     def __enter__(self):
-        print("Spinner Started.")
         self.run()
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.stop()
-        print("Spinner Stopped.")
-    '''
 
 
 class Spinner(_Progress):
     def __init__(self, root, side="right", anchor="se", padx=2, pady=2):
         _Progress.__init__(self, root)
         #self.pack(side=side, anchor=anchor, padx=padx, pady=pady)
-        self.cycle = itertools.cycle(["|", "/", "--", "\\"])
+        self.frames = ["|", "/", "--", "\\"]
 
 
 class Bouncer(_Progress):
     def __init__(self, root, side="right", anchor="se", padx=2, pady=2):
         _Progress.__init__(self, root)
         #self.pack(side=side, anchor=anchor, padx=padx, pady=pady)
-        self.cycle = itertools.cycle(
-            ["[*    ]", "[ *   ]", "[  *  ]", "[   * ]",
-             "[    *]", "[   * ]", "[  *  ]", "[ *   ]"])
+        self.frames = ["[*    ]", "[ *   ]", "[  *  ]", "[   * ]",
+                       "[    *]", "[   * ]", "[  *  ]", "[ *   ]"]
 
 
 class Elipse(_Progress):
@@ -965,8 +3993,7 @@ class Elipse(_Progress):
         _Progress.__init__(self, root)
         #self.pack(side=side, anchor=anchor, padx=padx, pady=pady)
         elipses = ["   ", ".  ", ".. ", "..."]
-        self.cycle = itertools.cycle(
-            ["[{}{}]".format(word, e) for e in elipses])
+        self.frames = ["[{}{}]".format(word, e) for e in elipses]
 
 
 '''
@@ -984,6 +4011,707 @@ app.mainloop()
 '''
 
 
+# =============================================================================
+# REPLAY
+
+# Dialog functions stubbed while recording and replaying
+_DIALOGS = [
+    (tkFileDialog, ("askopenfilename", "askopenfilenames", "askdirectory",
+                    "asksaveasfilename")),
+    (tkMessageBox, ("askokcancel", "askyesno", "askyesnocancel",
+                    "askquestion", "askretrycancel", "showinfo",
+                    "showwarning", "showerror")),
+    (tkSimpleDialog, ("askinteger", "askstring", "askfloat")),
+]
+
+
+def _menu_entries(menu, prefix, found):
+    """Adds the command entries of a menu and its submenus to found."""
+    last = menu.index("end")
+    for i in range(last + 1 if last is not None else 0):
+        kind = menu.type(i)
+        label = menu.entrycget(i, "label")
+        if kind == "cascade":
+            submenu = menu.nametowidget(menu.entrycget(i, "menu"))
+            _menu_entries(submenu, "{}{}/".format(prefix, label), found)
+        elif kind in ("command", "checkbutton", "radiobutton"):
+            _add_unique(found, "{}{}".format(prefix, label), (menu, i))
+    return
+
+
+def _add_unique(found, key, item):
+    """Adds item to found, numbering keys that are already used."""
+    name, n = key, 1
+    while name in found:
+        n += 1
+        name = "{} #{}".format(key, n)
+    found[name] = item
+    return
+
+
+_INVOKABLE = (tk.Button, tk.Checkbutton, tk.Radiobutton,
+              ttk.Button, ttk.Checkbutton, ttk.Radiobutton)
+
+
+def _invokers(root):
+    """Returns an OrderedDict of the buttons and menu entries under root.
+    Keys are labels prefixed with the labels of enclosing frames and menus
+    (e.g. "Files/Add", "menu/File/Open"); widgets are walked in creation
+    order so the same app always gets the same keys. Values are
+    (widget, None) for buttons and (menu, index) for menu entries."""
+    found = OrderedDict()
+
+    def walk(widget, prefix):
+        for child in widget.winfo_children():
+            if isinstance(child, tk.Menu):
+                # Submenus are reached through their cascade entries
+                if not isinstance(widget, tk.Menu):
+                    _menu_entries(child, prefix + "menu/", found)
+                continue
+            text = ""
+            if "text" in child.keys():
+                text = str(child.cget("text")).strip()
+            if isinstance(child, _INVOKABLE):
+                _add_unique(found, prefix + (text or child.winfo_class()),
+                            (child, None))
+            elif text:
+                walk(child, "{}{}/".format(prefix, text))
+                continue
+            walk(child, prefix)
+    walk(root, "")
+    return found
+
+
+def _invoke(item):
+    widget, index = item
+    if index is None:
+        return widget.invoke()
+    return widget.invoke(index)
+
+
+def _app_busy(app):
+    """True while the app has UI updates or worker tasks pending."""
+    dispatcher = getattr(app, "dispatcher", None)
+    if dispatcher is not None and dispatcher.depth:
+        return True
+    executor = getattr(app, "_executor", None)
+    return executor is not None and executor.busy
+
+
+class Recorder(object):
+    """Records a user session on an App for Replayer.
+
+    Button presses and menu actions (by label, see _invokers), edits of the
+    app's input widgets and the results of file, message and simple dialogs
+    are recorded with their time. Edits made by a recorded command (e.g.
+    BrowseFile setting its entry) are not recorded separately.
+    Use:
+        recorder = Recorder(app).start()
+        app.mainloop()
+        recorder.save("session.json")
+    """
+    def __init__(self, app):
+        self.app = app
+        self.actions = []
+        self._start = None
+        self._in_command = 0
+        self._commands = []
+        self._traces = []
+
+    def _add(self, kind, name, value=None):
+        if self._start is None:
+            return
+        if kind == "entry" and self._in_command:
+            return
+        action = {"time": _clock() - self._start, "kind": kind,
+                  "name": name, "value": value}
+        # Typing writes the variable per key; keep the last value only
+        last = self.actions[-1] if self.actions else None
+        if (kind == "entry" and last and last["kind"] == "entry" and
+                last["name"] == name):
+            self.actions[-1] = action
+        else:
+            self.actions.append(action)
+        return
+
+    def start(self):
+        """Starts recording."""
+        self._start = _clock()
+        for key, (widget, index) in _invokers(self.app).items():
+            if index is None:
+                original = str(widget.cget("command"))
+            else:
+                original = str(widget.entrycget(index, "command"))
+            self._commands.append((widget, index, original))
+            command = self._command(key, widget, original)
+            if index is None:
+                widget.configure(command=command)
+            else:
+                widget.entryconfigure(index, command=command)
+        for name, widget in self.app.widgets.items():
+            variable = _input_variable(widget)
+            if variable is not None:
+                trace = _trace_write(variable, lambda name=name,
+                                     variable=variable: self._add(
+                                         "entry", name, variable.get()))
+                self._traces.append((variable, trace))
+        for module, names in _DIALOGS:
+            for name in names:
+                module.stub(name, self._dialog(name, getattr(module, name)))
+        return self
+
+    def _command(self, key, widget, original):
+        def command():
+            self._add("command", key)
+            self._in_command += 1
+            try:
+                if original:
+                    widget.tk.eval(original)
+            finally:
+                self._in_command -= 1
+            return
+        return command
+
+    def _dialog(self, name, dialog):
+        def record(*args, **kwargs):
+            result = dialog(*args, **kwargs)
+            if isinstance(result, tuple):
+                result = list(result)
+            self._add("dialog", name, result)
+            return result
+        return record
+
+    def stop(self):
+        """Stops recording and restores the original commands and dialogs.
+        Returns the recorded actions."""
+        self._start = None
+        for widget, index, original in self._commands:
+            if index is None:
+                widget.configure(command=original)
+            else:
+                widget.entryconfigure(index, command=original)
+        for variable, trace in self._traces:
+            _trace_remove(variable, trace)
+        for module, names in _DIALOGS:
+            module.unstub(*names)
+        self._commands = []
+        self._traces = []
+        return self.actions
+
+    def save(self, filename):
+        """Writes the recorded actions to a JSON file."""
+        with open(filename, "w") as f:
+            json.dump({"actions": self.actions}, f, indent=1)
+        return
+
+
+class Replayer(object):
+    """Replays a recorded session on an App and measures each action.
+
+    Actions run on the main loop, one per after() callback, so worker
+    threads and the dispatcher keep running between them. Dialogs are
+    stubbed to return their recorded results (None once they run out).
+    Use:
+        app = build_my_app()
+        report = Replayer(app, "session.json").run(repeat=100)
+    """
+    def __init__(self, app, actions):
+        """
+        Args:
+            app: the App to drive; built the same way as when recorded
+            actions: Recorder.actions or the name of a saved session
+        """
+        if not isinstance(actions, list):
+            with open(actions) as f:
+                actions = json.load(f)["actions"]
+        self.app = app
+        self.actions = actions
+        # Dialog results are returned by the stubs, not performed
+        self._steps = [action for action in actions
+                       if action["kind"] != "dialog"]
+        self.latencies = defaultdict(list)
+        self.settle_times = defaultdict(list)
+        self._invokers = None
+        self._results = None
+        self._options = (None, 1, False)
+        self._done = None
+        self._begin = None
+        self._elapsed = None
+
+    def run(self, speed=None, repeat=1, wait_idle=False):
+        """Replays the session inside app.mainloop() and returns the report
+        (see report()). Use start() if the main loop is already running.
+        Args:
+            speed (float): 1.0 keeps the recorded pauses, 2.0 halves them;
+                None runs the actions back to back
+            repeat (int): number of times to replay the session
+            wait_idle (bool): before the next action, wait until the
+                dispatcher and worker pool are idle; measured as settle time
+        """
+        self.start(speed, repeat, wait_idle, self.app.quit)
+        self.app.mainloop()
+        return self.report()
+
+    def start(self, speed=None, repeat=1, wait_idle=False, callback=None):
+        """Starts replaying from the main loop; callback() is called when
+        finished."""
+        self._invokers = _invokers(self.app)
+        self._done = callback
+        self._elapsed = None
+        self.latencies.clear()
+        self.settle_times.clear()
+        self._options = (speed, repeat, wait_idle)
+        self._begin = _clock()
+        if not self._steps or repeat < 1:
+            self.app.after(0, self._finish)
+        else:
+            self._schedule(0, 0, 0)
+        return
+
+    def _schedule(self, delay, round_, index):
+        self.app.after(int(delay * 1000), self._step, round_, index)
+        return
+
+    def _step(self, round_, index):
+        speed, repeat, wait_idle = self._options
+        if index == 0:
+            self._results = defaultdict(deque)
+            for action in self.actions:
+                if action["kind"] == "dialog":
+                    self._results[action["name"]].append(action["value"])
+            self._stub_dialogs()
+        action = self._steps[index]
+        start = _clock()
+        try:
+            self._perform(action)
+        except Exception:
+            logging.exception("Replaying {} failed".format(action["name"]))
+        self.latencies[action["name"]].append(_clock() - start)
+
+        index += 1
+        if index == len(self._steps):
+            round_, index = round_ + 1, 0
+            if round_ == repeat:
+                if wait_idle:
+                    self._wait_idle(action["name"], start, 0, None, None)
+                else:
+                    self._finish()
+                return
+        delay = 0
+        if speed and index:
+            delay = max(0, self._steps[index]["time"] -
+                        self._steps[index - 1]["time"]) / speed
+        if wait_idle:
+            self._wait_idle(action["name"], start, delay, round_, index)
+        else:
+            self._schedule(delay, round_, index)
+        return
+
+    def _perform(self, action):
+        kind, name, value = action["kind"], action["name"], action["value"]
+        if kind == "command":
+            _invoke(self._invokers[name])
+        elif kind == "entry":
+            _input_variable(self.app.widgets[name]).set(value)
+        return
+
+    def _wait_idle(self, name, start, delay, round_, index):
+        if _app_busy(self.app):
+            self.app.after(1, self._wait_idle, name, start, delay, round_,
+                           index)
+            return
+        self.settle_times[name].append(_clock() - start)
+        if round_ is None:
+            # Last action
+            self._finish()
+        else:
+            self._schedule(delay, round_, index)
+        return
+
+    def _stub_dialogs(self):
+        for module, names in _DIALOGS:
+            for name in names:
+                module.stub(name, self._dialog(name))
+        return
+
+    def _dialog(self, name):
+        def replay(*args, **kwargs):
+            results = self._results[name]
+            result = results.popleft() if results else None
+            if isinstance(result, list):
+                result = tuple(result)
+            return result
+        return replay
+
+    def _finish(self):
+        self._elapsed = _clock() - self._begin
+        for module, names in _DIALOGS:
+            module.unstub(*names)
+        if self._done is not None:
+            self._done()
+        return
+
+    def report(self):
+        """Returns the throughput (actions/s) and the latency of each action
+        (count, mean, p50, p99 and max in ms; settle times if measured)."""
+        def summary(times):
+            times = sorted(times)
+            return {"count": len(times),
+                    "mean": sum(times) / len(times) * 1000,
+                    "p50": times[len(times) // 2] * 1000,
+                    "p99": times[min(len(times) - 1,
+                                     int(len(times) * 0.99))] * 1000,
+                    "max": times[-1] * 1000}
+        count = sum(len(times) for times in self.latencies.values())
+        elapsed = self._elapsed or (_clock() - self._begin)
+        return {"actions": count,
+                "elapsed": elapsed,
+                "throughput": count / elapsed if elapsed else 0.0,
+                "latency": dict((name, summary(times))
+                                for name, times in self.latencies.items()),
+                "settle": dict((name, summary(times))
+                               for name, times in self.settle_times.items())}
+
+
+# =============================================================================
+# APP SPECIFICATIONS
+
+class SpecError(ValueError):
+    """Raised when an app specification is invalid."""
+    pass
+
+
+# Widget type: (required keys, optional keys with defaults)
+_WIDGET_SPECS = {
+    "browsefile": ((), {"name": "browsefile", "filetypes": None,
+                        "default_ext": "*.*"}),
+    "browsedir": ((), {"name": "browsedir"}),
+    "radiobox": (("name", "options"), {
+        "label": "", "var_type": "int", "side": "top", "anchor": "nw",
+        "fill": "both", "expand": "yes", "alignment": "horizontal"}),
+    "text_input": (("label",), {"length": 20}),
+    "filetree": ((), {"name": "filetree", "virtual": False, "height": 5,
+                      "columns": [], "filetypes": None,
+                      "default_ext": "*.*"}),
+    "entrybox": (("name", "label", "button_label", "command"), {
+        "default_text": "", "clear_text": True}),
+    "statusbar": ((), {"name": "statusbar", "right": "Ready.",
+                       "right_alt": "Working..."}),
+    "spinner": ((), {"style": "spinner", "word": ""}),
+    "button": (("label", "command"), {"side": "top", "padx": 0,
+                                      "pady": 0}),
+}
+_APP_SPEC = {"title": "", "width": 400, "height": 200,
+             "workers": DEFAULT_WORKERS, "menus": [], "widgets": [],
+             "bindings": {}}
+# Compiled specs of files, by (path, modification time, size), and of dicts,
+# by their canonical JSON dump
+_SPEC_CACHE = OrderedDict()
+_SPEC_CACHE_SIZE = 128
+
+_STRING_TYPES = (str, type(u""))
+try:
+    _INTEGER_TYPES = (int, long)
+except NameError:  # Python 3
+    _INTEGER_TYPES = (int,)
+
+
+def _is_string(value):
+    return isinstance(value, _STRING_TYPES)
+
+
+def _is_integer(value):
+    return isinstance(value, _INTEGER_TYPES) and not isinstance(value, bool)
+
+
+def _is_list(value):
+    return isinstance(value, (list, tuple))
+
+
+def _is_pair_list(value, first=_is_string, second=lambda value: True):
+    return _is_list(value) and all(
+        _is_list(pair) and len(pair) == 2 and first(pair[0]) and
+        second(pair[1]) for pair in value)
+
+
+_STRING_CHECK = (_is_string, "a string")
+# Spec key: (check, description of the expected value)
+_FIELD_TYPES = dict.fromkeys(
+    ("title", "name", "label", "button_label", "default_text", "default_ext",
+     "right", "right_alt", "word", "style", "var_type", "side", "anchor",
+     "fill", "alignment"), _STRING_CHECK)
+_FIELD_TYPES.update(dict.fromkeys(
+    ("width", "height", "workers", "length", "padx", "pady"),
+    (_is_integer, "an integer")))
+_FIELD_TYPES.update(dict.fromkeys(
+    ("virtual", "clear_text"), (lambda value: isinstance(value, bool),
+                                "true or false")))
+_FIELD_TYPES.update({
+    "command": (lambda value: value is None or _is_string(value),
+                "a command name or null"),
+    "expand": (lambda value: _is_string(value) or isinstance(
+        value, _INTEGER_TYPES), "a string or boolean"),
+    "options": (_is_pair_list, "a list of [label, value] pairs"),
+    "filetypes": (lambda value: value is None or _is_pair_list(
+        value, second=_is_string), "a list of [description, pattern] pairs"),
+    "columns": (lambda value: _is_list(value) and all(
+        _is_string(column) for column in value), "a list of strings"),
+    "menus": (_is_list, "a list"),
+    "widgets": (_is_list, "a list"),
+    "actions": (_is_list, "a list"),
+    "bindings": (lambda value: isinstance(value, dict) and all(
+        _is_string(k) and _is_string(v) for k, v in value.items()),
+        "an object mapping event sequences to command names"),
+})
+
+
+def _fill(spec, required, optional, path):
+    """Checks a spec dict's keys and value types and returns it with
+    defaults filled in."""
+    if not isinstance(spec, dict):
+        raise SpecError("{}: expected an object".format(path))
+    unknown = set(spec) - set(required) - set(optional) - set(["type"])
+    if unknown:
+        raise SpecError("{}: unknown keys {}".format(
+            path, ", ".join(sorted(unknown))))
+    missing = [key for key in required if key not in spec]
+    if missing:
+        raise SpecError("{}: missing keys {}".format(
+            path, ", ".join(missing)))
+    for key, value in spec.items():
+        if key in _FIELD_TYPES and not _FIELD_TYPES[key][0](value):
+            raise SpecError("{}.{}: expected {}".format(
+                path, key, _FIELD_TYPES[key][1]))
+    filled = dict(optional)
+    filled.update(spec)
+    return filled
+
+
+def _compile_menu(actions, path):
+    """Returns a menu's actions as (label, command or submenu) tuples."""
+    compiled = []
+    for i, action in enumerate(actions):
+        item_path = "{}[{}]".format(path, i)
+        if not isinstance(action, dict):
+            raise SpecError("{}: expected an object".format(item_path))
+        if "actions" in action:
+            action = _fill(action, ("label", "actions"), {}, item_path)
+            compiled.append((action["label"], _compile_menu(
+                action["actions"], item_path + ".actions")))
+        else:
+            action = _fill(action, ("label",), {"command": None}, item_path)
+            compiled.append((action["label"], action["command"]))
+    return tuple(compiled)
+
+
+def compile_spec(spec):
+    """Validates an app specification and returns its compiled form.
+    Raises SpecError on invalid specs.
+    """
+    app = _fill(spec, (), _APP_SPEC, "app")
+    menus = []
+    for i, menu in enumerate(app["menus"]):
+        path = "menus[{}]".format(i)
+        menu = _fill(menu, ("name", "actions"), {}, path)
+        menus.append((menu["name"], _compile_menu(menu["actions"],
+                                                  path + ".actions")))
+    widgets = []
+    for i, widget in enumerate(app["widgets"]):
+        path = "widgets[{}]".format(i)
+        kind = widget.get("type") if isinstance(widget, dict) else None
+        if kind not in _WIDGET_SPECS:
+            raise SpecError("{}.type: expected one of {}".format(
+                path, ", ".join(sorted(_WIDGET_SPECS))))
+        required, optional = _WIDGET_SPECS[kind]
+        widget = _fill(widget, required, optional, path)
+        if kind == "spinner" and widget["style"] not in (
+                "spinner", "bouncer", "elipse"):
+            raise SpecError("{}.style: expected spinner, bouncer or "
+                            "elipse".format(path))
+        unknown = [c for c in widget.get("columns", ())
+                   if c not in METADATA_COLUMNS]
+        if unknown:
+            raise SpecError("{}.columns: unknown columns {}; expected {}"
+                            .format(path, ", ".join(unknown),
+                                    ", ".join(METADATA_COLUMNS)))
+        widgets.append((kind, widget))
+    return (app["title"], app["width"], app["height"], app["workers"],
+            tuple(menus), tuple(widgets),
+            tuple(sorted(app["bindings"].items())))
+
+
+def _cached_spec(key, compile_func):
+    """Returns the compiled spec cached under key, compiling it with
+    compile_func() if it is not cached."""
+    compiled = _SPEC_CACHE.pop(key, None)
+    if compiled is None:
+        compiled = compile_func()
+    _SPEC_CACHE[key] = compiled
+    while len(_SPEC_CACHE) > _SPEC_CACHE_SIZE:
+        _SPEC_CACHE.popitem(last=False)
+    return compiled
+
+
+def compile_spec_file(filename):
+    """Reads and compiles a specification file. Compiled files are cached
+    until they change, so building many apps from one file reads and
+    validates it once."""
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime, stat.st_size)
+    return _cached_spec(key, lambda: compile_spec(load_spec(filename)))
+
+
+def compile_spec_dict(spec):
+    """Compiles a specification dict, cached by its content. The spec is
+    compiled from a copy, so changing the dict afterwards does not change
+    cached results. Specs that are not JSON data are compiled uncached."""
+    try:
+        text = json.dumps(spec, sort_keys=True)
+    except (TypeError, ValueError):
+        return compile_spec(spec)
+    return _cached_spec(("dict", text), lambda: compile_spec(
+        json.loads(text, object_pairs_hook=OrderedDict)))
+
+
+def load_spec(filename):
+    """Reads an app specification from a JSON or YAML (requires PyYAML)
+    file."""
+    with open(filename) as f:
+        if os.path.splitext(filename)[1].lower() in (".yaml", ".yml"):
+            import yaml
+            return yaml.safe_load(f)
+        return json.load(f, object_pairs_hook=OrderedDict)
+
+
+def _command(app, name):
+    """Resolves a command name to a method of the app."""
+    if name is None:
+        return NULL_ACTION
+    try:
+        return getattr(app, name)
+    except AttributeError:
+        raise SpecError("Unknown command: {}".format(name))
+
+
+def _build_menu(app, menu, actions):
+    for label, action in actions:
+        if isinstance(action, tuple):
+            menu.add_submenu(label)
+            _build_menu(app, menu.items[label], action)
+        else:
+            menu.add_action(label, _command(app, action))
+    return
+
+
+def _build_widget(app, kind, spec):
+    """Creates one widget of a compiled spec."""
+    if kind == "button":
+        app.add_button(spec["label"], _command(app, spec["command"]),
+                       side=spec["side"], padx=spec["padx"],
+                       pady=spec["pady"])
+        return
+    if kind == "text_input":
+        app.add_text_input(spec["label"], spec["length"])
+        return
+    if kind == "browsefile":
+        widget = BrowseFile(app)
+    elif kind == "browsedir":
+        widget = BrowseDir(app)
+    elif kind == "filetree":
+        widget = FileTree(app, spec["virtual"], spec["height"],
+                          spec["columns"])
+    elif kind == "radiobox":
+        widget = Radiobox(app, spec["var_type"], spec["label"],
+                          spec["side"], spec["anchor"], spec["fill"],
+                          spec["expand"], spec["alignment"])
+        for label, value in spec["options"]:
+            widget.add_button(label, value)
+    elif kind == "entrybox":
+        widget = EntryBox(app, spec["label"], spec["button_label"],
+                          _command(app, spec["command"]),
+                          spec["default_text"], spec["clear_text"])
+    elif kind == "statusbar":
+        widget = StatusBar(app, right=spec["right"],
+                           right_alt=spec["right_alt"])
+    else:
+        styles = {"spinner": Spinner, "bouncer": Bouncer}
+        if spec["style"] == "elipse":
+            Elipse(app, word=spec["word"])
+        else:
+            styles[spec["style"]](app)
+        return
+    if spec.get("filetypes"):
+        widget.set_filetypes(spec["default_ext"],
+                             [tuple(t) for t in spec["filetypes"]])
+    app.widgets[_clean_name(spec["name"])] = widget
+    return
+
+
+def _accepts_keyword(func, name):
+    """Returns True if func can be called with the keyword argument name."""
+    try:
+        spec = inspect.getfullargspec(func)
+        return (name in spec.args or name in spec.kwonlyargs or
+                spec.varkw is not None)
+    except AttributeError:  # Python 2
+        spec = inspect.getargspec(func)
+        return name in spec.args or spec.keywords is not None
+
+
+def build_app(spec, commands=None, app_class=None):
+    """Builds an app from a specification (a dict, or a JSON/YAML file).
+
+    The window stays hidden while all widgets are created and is laid out
+    once at the end.
+    Args:
+        spec (dict or str): the app specification, e.g.
+            {"title": "Tool",
+             "menus": [{"name": "File",
+                        "actions": [{"label": "Close", "command": "close"}]}],
+             "widgets": [{"type": "browsefile", "name": "input"},
+                         {"type": "button", "label": "OK",
+                          "command": "cmd_collect_quit"}],
+             "bindings": {"<Return>": "cmd_collect_quit"}}
+        commands (dict): functions added to the app with add_command, so
+            the spec can refer to them by name
+        app_class (class): App subclass to build (default: App)
+    Returns the app.
+    """
+    if isinstance(spec, dict):
+        compiled = compile_spec_dict(spec)
+    else:
+        compiled = compile_spec_file(spec)
+    title, width, height, workers, menus, widgets, bindings = compiled
+    app_class = app_class or App
+    if _accepts_keyword(app_class.__init__, "workers"):
+        app = app_class(title, width, height, workers=workers)
+    else:
+        app = app_class(title, width, height)
+    app.withdraw()
+    try:
+        for name, func in sorted((commands or {}).items()):
+            app.add_command(name, func)
+        if menus:
+            menubar = Menubar(app)
+            for name, actions in menus:
+                menubar.add_menu(name)
+                _build_menu(app, menubar.menus[name], actions)
+            app.widgets["menubar"] = menubar
+        for kind, widget_spec in widgets:
+            _build_widget(app, kind, widget_spec)
+        for sequence, name in bindings:
+            command = _command(app, name)
+            app.bind(sequence, lambda event, command=command: command())
+    except Exception:
+        # Don't leave a hidden window behind, e.g. for an unknown command
+        app.destroy()
+        raise
+    # Lay out everything at once
+    app.update_idletasks()
+    app.deiconify()
+    return app
+
+
 if __name__ == "__main__":
     # Logging output
     logging.basicConfig(level=logging.DEBUG,
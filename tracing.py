@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""tracing.py -- Opt-in span tracing in the Chrome trace format.
+
+Spans recorded from any thread are written as a Chrome-trace JSON file that
+can be opened in chrome://tracing or https://ui.perfetto.dev. Tracing is off
+by default; enable it with `tracing.enable("trace.json")` or by setting the
+TKIT_TRACE environment variable to a file name before importing tkit. The
+file is written at exit, or when `save()` is called.
+
+While disabled, `span()` returns a shared no-op context manager and the
+instrumented code only checks the `enabled` flag.
+
+Use:
+    with tracing.span("load", "io", path=path):
+        load(path)
+
+    @tracing.traced("Refresh")
+    def refresh():
+        ...
+
+"""
+
+import atexit
+import functools
+import os
+import threading
+import time
+
+__all__ = ["enable", "disable", "clear", "save", "events", "span", "traced",
+           "complete"]
+
+# Same clock as tkit and consolemsgs, so their timings can be recorded
+_clock = getattr(time, "perf_counter", time.time)
+
+enabled = False
+filename = None
+
+_events = []
+_threads = {}
+_start = _clock()
+_lock = threading.Lock()
+_atexit_registered = []
+
+try:
+    _get_ident = threading.get_ident
+except AttributeError:  # Python 2
+    import thread
+    _get_ident = thread.get_ident
+
+
+def enable(trace_file=None):
+    """Starts recording spans.
+    Args:
+        trace_file (str): file written at exit; None to only save() by hand
+    """
+    global enabled, filename
+    filename = trace_file
+    if trace_file and not _atexit_registered:
+        _atexit_registered.append(True)
+        atexit.register(_save_at_exit)
+    enabled = True
+    return
+
+
+def disable():
+    """Stops recording spans; recorded spans are kept until saved."""
+    global enabled
+    enabled = False
+    return
+
+
+def clear():
+    """Discards the recorded spans."""
+    del _events[:]
+    return
+
+
+def complete(name, category, start, duration, args=None):
+    """Records a span that has already finished.
+    Args:
+        name (str): span name
+        category (str): e.g. "task", "thread", "ui", "console"
+        start (float): start time from the module's clock
+        duration (float): seconds
+        args (dict): extra values shown with the span
+    """
+    tid = _get_ident()
+    if tid not in _threads:
+        _threads[tid] = threading.current_thread().name
+    event = {"name": name, "cat": category, "ph": "X", "tid": tid,
+             "ts": (start - _start) * 1e6, "dur": duration * 1e6}
+    if args:
+        event["args"] = args
+    # list.append is atomic; no lock on the recording path
+    _events.append(event)
+    return
+
+
+class _Span(object):
+    """Context manager recording one span."""
+    __slots__ = ("name", "category", "args", "start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = _clock()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = _clock() - self.start
+        if exc_type is not None:
+            self.args = dict(self.args or {}, error=exc_type.__name__)
+        complete(self.name, self.category, self.start, duration, self.args)
+        return False
+
+
+class _NullSpan(object):
+    """Span used while tracing is disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, category="task", **args):
+    """Returns a context manager recording a span if tracing is enabled."""
+    if not enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name=None, category="task"):
+    """Decorator recording a span per call; checked at call time, so
+    functions decorated before enable() are traced too."""
+    def decorator(func):
+        span_name = name or getattr(func, "__name__", repr(func))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, category, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def events():
+    """Returns the recorded events, with thread names, as Chrome-trace
+    dicts."""
+    pid = os.getpid()
+    out = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": name}}
+           for tid, name in list(_threads.items())]
+    for event in list(_events):
+        event = dict(event, pid=pid)
+        out.append(event)
+    return out
+
+
+def save(trace_file=None):
+    """Writes the recorded spans to a Chrome-trace JSON file.
+    Returns the file name."""
+    import json
+    trace_file = trace_file or filename or "tkit_trace.json"
+    with _lock:
+        with open(trace_file, "w") as f:
+            json.dump({"traceEvents": events(),
+                       "displayTimeUnit": "ms"}, f)
+    return trace_file
+
+
+def _save_at_exit():
+    if filename and _events:
+        save(filename)
+    return
+
+
+if os.environ.get("TKIT_TRACE"):
+    enable(os.environ["TKIT_TRACE"])